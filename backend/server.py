@@ -1,41 +1,426 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, Header, Query, Request, Response, UploadFile, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
+from pymongo.write_concern import WriteConcern
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 import os
+import io
+import csv
+import codecs
+import json
+import orjson
+import gzip
+import zlib
+import asyncio
+import base64
+import hashlib
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+import time
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from typing import List, Optional, Dict, Any, Literal, Union
 import uuid
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 import jwt
 from bson import ObjectId
+from bson.errors import InvalidId
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# ============== METRICS ==============
+
+# Prometheus metrics served at /metrics. Every hook is a dict lookup plus a
+# histogram observe, cheap enough to leave on under full load.
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL_SECONDS', '0.5'))
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ["method", "route"],
+)
+HTTP_REQUESTS = Counter("http_requests_total", "Requests by route and status", ["method", "route", "status"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled by route", ["method", "route"])
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+MONGO_COMMAND_FAILURES = Counter("mongodb_command_failures_total", "Failed MongoDB commands", ["collection", "command"])
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter("mongodb_pool_checkout_failures_total", "Failed connection checkouts", ["reason"])
+MONGO_POOL_CHECKED_OUT = Gauge("mongodb_pool_checked_out_connections", "Connections currently checked out")
+EVENT_LOOP_LAG = Gauge("event_loop_lag_seconds", "How late the last event-loop probe woke up")
+RATE_LIMITED = Counter("rate_limited_requests_total", "Requests rejected by a rate limit", ["route"])
+CONTACT_BUFFER_PENDING = Gauge("contact_buffer_pending", "Contact submissions waiting to be written")
+ORDER_FEED_SUBSCRIBERS = Gauge("order_feed_subscribers", "Admin order feed connections in this worker")
+ORDERS_ARCHIVED = Counter("orders_archived_total", "Finished orders moved to orders_archive")
+SHED_REQUESTS = Counter("shed_requests_total", "Requests rejected by load shedding", ["tier"])
+event_loop_lag = 0.0
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Command latency and failures per collection; pymongo calls this from Motor's worker threads."""
+
+    def __init__(self):
+        self._collections: Dict[tuple, str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Checkout wait time; a checkout starts and finishes on the same thread."""
+
+    def __init__(self):
+        self._checkout = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._checkout.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - self._checkout.started)
+        MONGO_POOL_CHECKED_OUT.inc()
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - self._checkout.started)
+        MONGO_POOL_CHECKOUT_FAILURES.labels(event.reason).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+class InstrumentedRoute(APIRoute):
+    """Times each request, including streamed bodies, under its route template."""
+
+    async def handle(self, scope, receive, send):
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method, self.path_format)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await super().handle(scope, receive, send_with_status)
+        except StarletteHTTPException as exc:
+            status_code = exc.status_code
+            raise
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, self.path_format).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, self.path_format, str(status_code)).inc()
+            in_flight.dec()
+
+async def measure_event_loop_lag():
+    global event_loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        event_loop_lag = max(0.0, loop.time() - started - EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        EVENT_LOOP_LAG.set(event_loop_lag)
+
+# MongoDB connection: the client is created and warmed up by the app lifespan
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_WARMUP = os.environ.get('MONGO_WARMUP', 'true').lower() == 'true'
+# Read-mostly routes may read from secondaries at most this far behind the
+# primary; 90 seconds is the smallest maxStalenessSeconds drivers accept
+MONGO_SECONDARY_READS = os.environ.get('MONGO_SECONDARY_READS', 'false').lower() == 'true'
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))
+
+client: Optional[AsyncIOMotorClient] = None
+db = None
+read_db = None  # db, or a secondaryPreferred view of it when MONGO_SECONDARY_READS is on
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        mongo_url,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()],
+    )
+
+def secondary_read_db(database):
+    if not MONGO_SECONDARY_READS:
+        return database
+    return database.with_options(read_preference=SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_SECONDS))
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
-# Password hashing
+# Product search: in-memory index, kept current by this worker's admin writes and
+# rebuilt (off the event loop) when the catalog_state marker shows another
+# worker changed the catalog; the marker is checked this often
+SEARCH_INDEX_REFRESH_SECONDS = float(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', '300'))
+SEARCH_PREFIX_EXPANSIONS = int(os.environ.get('SEARCH_PREFIX_EXPANSIONS', '50'))
+# Shorter last words only match whole words; one Devanagari syllable is often two
+# code points and would expand to a large part of the vocabulary
+SEARCH_MIN_PREFIX_LENGTH = 3
+
+# Idempotency-Key replay window, in-flight lease and how long a duplicate waits
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '60'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '10'))
+IDEMPOTENCY_POLL_SECONDS = 0.05
+IDEMPOTENCY_STORE_ATTEMPTS = 3
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_CACHE_MAX_ENTRIES', '10000'))
+
+# Indexes backing every route's lookup. Email and mobile number are optional
+# (stored as null when missing), so their unique indexes only cover non-empty
+# strings; equality lookups on a real value still qualify for the partial index.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel(
+            [("email", ASCENDING)], unique=True, name="email_unique",
+            partialFilterExpression={"email": {"$gt": ""}},
+        ),
+        IndexModel(
+            [("mobile_number", ASCENDING)], unique=True, name="mobile_number_unique",
+            partialFilterExpression={"mobile_number": {"$gt": ""}},
+        ),
+    ],
+    "products": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        # Catalog listing: every sort ends on _id so keyset pages are stable
+        IndexModel([("category", ASCENDING), ("_id", ASCENDING)], name="category_id"),
+        IndexModel([("effective_price", ASCENDING), ("_id", ASCENDING)], name="effective_price_id"),
+        IndexModel(
+            [("category", ASCENDING), ("effective_price", ASCENDING), ("_id", ASCENDING)],
+            name="category_effective_price_id",
+        ),
+        IndexModel([("title", ASCENDING), ("_id", ASCENDING)], name="title_id"),
+        IndexModel([("category", ASCENDING), ("title", ASCENDING), ("_id", ASCENDING)], name="category_title_id"),
+        # release_abandoned_reservations; only products with a checkout in flight
+        IndexModel([("reservations.reserved_at", ASCENDING)], name="reservations_reserved_at", sparse=True),
+    ],
+    "sales_rollups": [
+        IndexModel([("kind", ASCENDING), ("date", ASCENDING)], name="kind_date"),
+        IndexModel([("kind", ASCENDING), ("units", DESCENDING)], name="kind_units"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS, name="created_at_ttl"),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        # Order history pages walk (order_date, id) newest first
+        IndexModel(
+            [("user_id", ASCENDING), ("order_date", DESCENDING), ("id", DESCENDING)],
+            name="user_id_order_date_id",
+        ),
+        IndexModel([("order_date", DESCENDING), ("id", DESCENDING)], name="order_date_id"),
+        # Bulk status changes by filter, e.g. every Pending order before a date
+        IndexModel([("status", ASCENDING), ("order_date", ASCENDING)], name="status_order_date"),
+    ],
+    # Finished orders moved out of orders; same history lookups, no status work
+    "orders_archive": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel(
+            [("user_id", ASCENDING), ("order_date", DESCENDING), ("id", DESCENDING)],
+            name="user_id_order_date_id",
+        ),
+        IndexModel([("order_date", DESCENDING), ("id", DESCENDING)], name="order_date_id"),
+    ],
+}
+
+# Catalog cache: TTL is a safety net for writes made by other workers
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '300'))
+CATALOG_CACHE_MAX_BYTES = int(os.environ.get('CATALOG_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Response compression. Cached catalog bodies are compressed once at higher
+# settings; brotli quality 11 is ~15x slower than 9 for a few percent less
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 9
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml")
+# Server-Sent Events must reach the client frame by frame, not when a compressor flushes
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+# Order listings
+ORDER_STATUSES = ["Pending", "Shipped", "Delivered", "Cancelled"]
+ORDER_PAGE_SIZE = 50
+ORDER_PAGE_MAX_SIZE = 200
+BULK_STATUS_MAX_ORDERS = int(os.environ.get('BULK_STATUS_MAX_ORDERS', '10000'))
+ORDER_STREAM_BATCH_SIZE = int(os.environ.get('ORDER_STREAM_BATCH_SIZE', '500'))
+# Checkout tags each product it takes stock from until the order is stored; a
+# tag older than the timeout with no order (the worker died in between) is
+# given back by a periodic sweep
+STOCK_RESERVATION_TIMEOUT_SECONDS = float(os.environ.get('STOCK_RESERVATION_TIMEOUT_SECONDS', '900'))
+STOCK_RESERVATION_SWEEP_SECONDS = float(os.environ.get('STOCK_RESERVATION_SWEEP_SECONDS', '300'))
+# Delivered and Cancelled orders older than this move to orders_archive. History
+# routes only read the archive past this age, so raising it later needs the
+# archived orders in between moved back first.
+ORDER_ARCHIVE_STATUSES = ["Delivered", "Cancelled"]
+ORDER_ARCHIVE_ENABLED = os.environ.get('ORDER_ARCHIVE_ENABLED', 'true').lower() == 'true'
+ORDER_ARCHIVE_AFTER_DAYS = float(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', '90'))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.environ.get('ORDER_ARCHIVE_BATCH_SIZE', '500'))
+ORDER_ARCHIVE_INTERVAL_SECONDS = float(os.environ.get('ORDER_ARCHIVE_INTERVAL_SECONDS', '3600'))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Product cards only show the start of the description (view=card)
+PRODUCT_CARD_DESCRIPTION_LENGTH = int(os.environ.get('PRODUCT_CARD_DESCRIPTION_LENGTH', '80'))
+
+# Catalog import/export
+PRODUCT_IMPORT_BATCH_SIZE = int(os.environ.get('PRODUCT_IMPORT_BATCH_SIZE', '1000'))
+PRODUCT_IMPORT_MAX_REPORTED_ERRORS = 1000
+# Longest CSV record, in characters; bounds what one unbalanced quote can buffer
+PRODUCT_IMPORT_MAX_RECORD_CHARS = int(os.environ.get('PRODUCT_IMPORT_MAX_RECORD_CHARS', str(256 * 1024)))
+PRODUCT_EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Product images: uploads are resized to these widths in a worker pool and
+# stored under content-hashed names, so they can be cached forever
+IMAGE_DIR = Path(os.environ.get('IMAGE_DIR', str(ROOT_DIR / 'media' / 'images')))
+IMAGE_WIDTHS = sorted(int(width) for width in os.environ.get('IMAGE_WIDTHS', '320,640,1024').split(','))
+IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT', 'webp' if features.check('webp') else 'jpeg')
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', '80'))
+IMAGE_MAX_UPLOAD_BYTES = int(os.environ.get('IMAGE_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', str(min(4, os.cpu_count() or 1))))
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Created on first use and shut down with the app, like password_executor
+image_executor: Optional[ThreadPoolExecutor] = None
+
+# Authenticated-principal caches: decoded tokens and projected user profiles
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', '60'))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES', '10000'))
+USER_PROFILE_PROJECTION = {"_id": 0, "id": 1, "username": 1, "email": 1, "mobile_number": 1, "role": 1}
+
+# Password hashing runs in its own thread pool (bcrypt releases the GIL) so a
+# burst of logins can't stall the event loop; beyond the pending cap we shed load
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64'))
+# Created on first use and shut down with the app; a restarted app gets a new pool
+password_executor: Optional[ThreadPoolExecutor] = None
+password_jobs_pending = 0
+
+# Contact submissions are buffered and written with insert_many. Durability:
+# "buffered" acknowledges once queued (lost if the process dies before a flush),
+# "acknowledged" waits for the batch write, "journaled" also for the journal.
+CONTACT_DURABILITY = os.environ.get('CONTACT_DURABILITY', 'buffered')
+CONTACT_BATCH_SIZE = int(os.environ.get('CONTACT_BATCH_SIZE', '100'))
+CONTACT_FLUSH_INTERVAL_SECONDS = float(os.environ.get('CONTACT_FLUSH_INTERVAL_SECONDS', '1'))
+CONTACT_QUEUE_MAX = int(os.environ.get('CONTACT_QUEUE_MAX', '10000'))
+# How long a submission waits for room in a full queue before a 503
+CONTACT_ENQUEUE_TIMEOUT_SECONDS = float(os.environ.get('CONTACT_ENQUEUE_TIMEOUT_SECONDS', '0.5'))
+CONTACT_ACK_TIMEOUT_SECONDS = float(os.environ.get('CONTACT_ACK_TIMEOUT_SECONDS', '10'))
+CONTACT_SHUTDOWN_TIMEOUT_SECONDS = float(os.environ.get('CONTACT_SHUTDOWN_TIMEOUT_SECONDS', '10'))
 security = HTTPBearer()
 
-# Create the main app without a prefix
-app = FastAPI()
+# Token-bucket rate limits as "requests per minute/burst", applied per client
+# IP and, where the request names an account or sender, per identifier too
+RATE_LIMITS = {
+    "login": os.environ.get('RATE_LIMIT_LOGIN', '30/10'),
+    "signup": os.environ.get('RATE_LIMIT_SIGNUP', '10/5'),
+    "contact": os.environ.get('RATE_LIMIT_CONTACT', '5/5'),
+    "init": os.environ.get('RATE_LIMIT_INIT', '2/2'),
+}
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+# X-Forwarded-For entries appended by our own proxies. The deployment sits behind
+# one (Render's edge), whose socket address every visitor would otherwise share;
+# set 0 only when clients connect directly, or they could spoof the header
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))
+
+# Adaptive load shedding. Past the soft limits, expensive routes (bcrypt,
+# writes anyone can make) get 503 so browsing keeps its latency; past the hard
+# limits every request but /metrics does
+SHED_SOFT_LAG_SECONDS = float(os.environ.get('SHED_SOFT_LAG_SECONDS', '0.1'))
+SHED_HARD_LAG_SECONDS = float(os.environ.get('SHED_HARD_LAG_SECONDS', '0.5'))
+SHED_SOFT_MAX_IN_FLIGHT = int(os.environ.get('SHED_SOFT_MAX_IN_FLIGHT', '256'))
+SHED_HARD_MAX_IN_FLIGHT = int(os.environ.get('SHED_HARD_MAX_IN_FLIGHT', '1024'))
+SHEDDABLE_PATHS = {"/api/auth/login", "/api/auth/signup", "/api/contact", "/api/init", "/api/admin/analytics/rebuild"}
+# Long-lived streams; they hold a connection, not work, so they don't count as in flight
+LONG_LIVED_PATHS = {"/api/admin/orders/feed"}
+
+# Admin order feed: "changestream" needs a replica set, "tail" polls order_date,
+# "auto" tries the change stream and falls back to tailing on a standalone mongod
+ORDER_FEED_MODE = os.environ.get('ORDER_FEED_MODE', 'auto')
+ORDER_FEED_POLL_SECONDS = float(os.environ.get('ORDER_FEED_POLL_SECONDS', '1'))
+ORDER_FEED_HEARTBEAT_SECONDS = float(os.environ.get('ORDER_FEED_HEARTBEAT_SECONDS', '15'))
+# Events buffered per connection; a client that falls further behind is disconnected and resumes
+ORDER_FEED_QUEUE_SIZE = int(os.environ.get('ORDER_FEED_QUEUE_SIZE', '1000'))
+# Most events replayed on reconnect before telling the client to reload instead
+ORDER_FEED_REPLAY_LIMIT = int(os.environ.get('ORDER_FEED_REPLAY_LIMIT', '1000'))
+# Tail mode re-reads this far behind the newest order_date it has seen, since
+# order_date is stamped before the insert and a slow insert can land out of order
+ORDER_FEED_TAIL_GRACE_SECONDS = float(os.environ.get('ORDER_FEED_TAIL_GRACE_SECONDS', '5'))
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=InstrumentedRoute)
 
 # ============== MODELS ==============
 
@@ -65,6 +450,14 @@ class ProductCreate(BaseModel):
     category: str  # Book, Magazine, Novel
     stock: int = 100
 
+class ProductUpdate(ProductCreate):
+    # Checkouts move stock while the admin form is open; a PUT only writes it
+    # when sent, and /admin/products/{id}/stock adjusts it by a delta instead
+    stock: Optional[int] = None
+
+class StockAdjustment(BaseModel):
+    delta: int
+
 class ProductResponse(BaseModel):
     id: str
     title: str
@@ -74,6 +467,28 @@ class ProductResponse(BaseModel):
     image_url: Optional[str] = None
     category: str
     stock: int
+    # Uploaded image sizes as srcset descriptors, e.g. {"320w": "/api/images/...-320w.webp"}
+    srcset: Optional[Dict[str, str]] = None
+
+class ProductFields(BaseModel):
+    """A product listed with ?fields= or a ?view= other than full: only the
+    requested fields are present, and view=card shortens the description."""
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    original_price: Optional[float] = None
+    sale_price: Optional[float] = None
+    image_url: Optional[str] = None
+    category: Optional[str] = None
+    stock: Optional[int] = None
+    srcset: Optional[Dict[str, str]] = None
+
+class ProductPage(BaseModel):
+    products: List[Union[ProductResponse, ProductFields]]
+    next_cursor: Optional[str] = None
+
+class ProductSearchResults(BaseModel):
+    products: List[ProductResponse]
 
 class CartItem(BaseModel):
     product_id: str
@@ -110,6 +525,60 @@ class OrderResponse(BaseModel):
     status: str = "Pending"
     order_date: str
 
+class OrderFields(BaseModel):
+    """An order listed with ?fields= or ?view=summary: only the requested fields are present."""
+    id: str
+    user_id: Optional[str] = None
+    products: Optional[List[OrderProduct]] = None
+    total_amount: Optional[float] = None
+    shipping_address: Optional[Dict[str, Any]] = None
+    payment_mode: Optional[str] = None
+    status: Optional[str] = None
+    order_date: str
+
+class OrderPage(BaseModel):
+    orders: List[Union[OrderResponse, OrderFields]]
+    next_cursor: Optional[str] = None
+
+class OrderStatusFilter(BaseModel):
+    status: Optional[str] = None
+    before: Optional[datetime] = None  # order_date strictly before; naive means UTC
+
+class BulkOrderStatusUpdate(BaseModel):
+    status: str
+    order_ids: Optional[List[str]] = Field(None, min_length=1, max_length=BULK_STATUS_MAX_ORDERS)
+    filter: Optional[OrderStatusFilter] = None
+
+class BulkOrderStatusResult(BaseModel):
+    matched: int
+    updated: int
+    # True when the filter matched more than BULK_STATUS_MAX_ORDERS; send it again
+    more: bool = False
+    # "archived": the order was moved to orders_archive and can't be changed
+    results: Dict[str, Literal["updated", "unchanged", "conflict", "archived", "not_found"]]
+
+class RevenueDay(BaseModel):
+    date: str
+    revenue: float
+    orders: int
+    units: int
+
+class ProductSales(BaseModel):
+    product_id: str
+    title: str
+    units: int
+    revenue: float
+
+class CategorySales(BaseModel):
+    category: str
+    orders: int
+    units: int
+    revenue: float
+
+class OrderBreakdown(BaseModel):
+    by_status: Dict[str, int]
+    by_category: List[CategorySales]
+
 class ContactForm(BaseModel):
     name: str
     email: str
@@ -117,11 +586,78 @@ class ContactForm(BaseModel):
 
 # ============== HELPER FUNCTIONS ==============
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# Documents read with these projections already have the response model's shape,
+# so read routes serialize them straight to JSON instead of validating every item
+# again; the routes keep response_model for the OpenAPI schema
+PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+# CSV export columns: what the import accepts
+PRODUCT_EXPORT_FIELDS = ("id", *ProductCreate.model_fields)
+PRODUCT_RESPONSE_PROJECTION = {field: 1 for field in PRODUCT_FIELDS}
+ORDER_FIELDS = tuple(OrderResponse.model_fields)
+
+def order_projection(fields) -> dict:
+    projection = {"_id": 0, **{field: 1 for field in fields if field != "products"}}
+    if "products" in fields:
+        projection.update({f"products.{field}": 1 for field in OrderProduct.model_fields})
+    return projection
+
+ORDER_RESPONSE_PROJECTION = order_projection(ORDER_FIELDS)
+
+# Named views for list routes (?view=); the projections run inside Mongo, so
+# fields a view leaves out are never read, sent or serialized
+PRODUCT_VIEWS = {
+    "full": PRODUCT_RESPONSE_PROJECTION,
+    "card": {
+        **PRODUCT_RESPONSE_PROJECTION,
+        "description": {"$substrCP": ["$description", 0, PRODUCT_CARD_DESCRIPTION_LENGTH]},
+    },
+}
+ORDER_VIEWS = {
+    "full": ORDER_RESPONSE_PROJECTION,
+    "summary": order_projection(("id", "products", "total_amount", "payment_mode", "status", "order_date")),
+}
+
+def requested_fields(fields: Optional[str], view: Optional[str], allowed: tuple, required: tuple) -> Optional[tuple]:
+    """Fields named in ``?fields=`` in response order, plus ``required``; None if not given."""
+    if fields is None:
+        return None
+    if view is not None:
+        raise HTTPException(status_code=400, detail="Use either fields or view, not both")
+    names = {name.strip() for name in fields.split(",")} - {""}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in allowed if field in names or field in required)
+
+def trusted_product(product: dict, fields: tuple = PRODUCT_FIELDS) -> dict:
+    """Response shape of a stored product, with unset optional fields as null."""
+    return {field: product.get(field) for field in fields}
+
+def password_pool() -> ThreadPoolExecutor:
+    global password_executor
+    if password_executor is None:
+        password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return password_executor
+
+async def run_password_job(func, *args):
+    global password_jobs_pending
+    if password_jobs_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many authentication requests, please retry",
+            headers={"Retry-After": "1"},
+        )
+    password_jobs_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_pool(), func, *args)
+    finally:
+        password_jobs_pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await run_password_job(pwd_context.hash, password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(pwd_context.verify, plain_password, hashed_password)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -130,32 +666,789 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+class TTLCache:
+    """Bounded LRU whose entries expire after ``ttl_seconds`` or an earlier deadline."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None):
+        deadline = time.time() + self.ttl_seconds
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        self._entries[key] = (deadline, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        self._entries.pop(key, None)
+
+token_cache = TTLCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES)
+# Profiles are only written at signup; a route that changes a field in
+# USER_PROFILE_PROJECTION must pop the user's entry here
+user_cache = TTLCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES)
+
+def decode_token(token: str) -> dict:
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        
-        user = await db.users.find_one({"id": user_id})
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
+    except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    claims = {"id": payload["sub"], "role": payload.get("role", "user")}
+    token_cache.set(token, claims, expires_at=payload.get("exp"))
+    return claims
 
-async def get_current_admin(user: dict = Depends(get_current_user)):
-    if user.get("role") != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Claims-only identity: trusts the ``sub`` and ``role`` signed into the token."""
+    return decode_token(credentials.credentials)
+
+async def get_current_user(principal: dict = Depends(get_current_principal)):
+    """The caller's profile (no password hash or cart), loaded by projection and cached."""
+    user = user_cache.get(principal["id"])
+    if user is None:
+        user = await db.users.find_one({"id": principal["id"]}, USER_PROFILE_PROJECTION)
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(principal["id"], user)
     return user
 
+async def get_current_admin(principal: dict = Depends(get_current_principal)):
+    if principal["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return principal
+
+async def load_cart(user_id: str) -> List[dict]:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "cart": 1})
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user.get("cart", [])
+
+async def fetch_products_by_id(product_ids: List[str], projection: Optional[dict] = None) -> Dict[str, dict]:
+    """Load many products in one round trip, keyed by product id."""
+    projection = {"_id": 0, **(projection or {})}
+    if len(projection) > 1:
+        projection["id"] = 1
+    cursor = db.products.find({"id": {"$in": list(set(product_ids))}}, projection)
+    return {product["id"]: product async for product in cursor}
+
+def dump_json(content: Any) -> bytes:
+    # Same encoding as the app's ORJSONResponse
+    return orjson.dumps(content)
+
+def effective_price(product: dict) -> float:
+    return product.get("sale_price") or product["original_price"]
+
+# effective_price() inside an update pipeline
+EFFECTIVE_PRICE_EXPRESSION = {"$cond": [{"$gt": ["$sale_price", 0]}, "$sale_price", "$original_price"]}
+
+# Sort field and direction for each catalog ordering; _id breaks ties
+PRODUCT_SORTS = {
+    "default": ("_id", ASCENDING),
+    "price_asc": ("effective_price", ASCENDING),
+    "price_desc": ("effective_price", DESCENDING),
+    "title": ("title", ASCENDING),
+}
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Only sort key values: an object here would become a query operator
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_filter(sort_keys: List[tuple], after: list) -> dict:
+    """Match documents strictly after ``after`` in the ``sort_keys`` ordering."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort_keys):
+        clause = {prev_field: after[j] for j, (prev_field, _) in enumerate(sort_keys[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": after[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+async def backfill_effective_price(database):
+    # Products written before effective_price existed; same rule as effective_price()
+    await database.products.update_many(
+        {"effective_price": {"$exists": False}},
+        [{"$set": {"effective_price": EFFECTIVE_PRICE_EXPRESSION}}],
+    )
+
+# ============== COMPRESSION ==============
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br over gzip from an Accept-Encoding header; None means send identity."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def compress_body(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=CACHED_BROTLI_QUALITY if cached else COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=CACHED_GZIP_LEVEL if cached else COMPRESSION_GZIP_LEVEL, mtime=0)
+
+class StreamCompressor:
+    """Incremental encoder for streamed bodies; each chunk is flushed so NDJSON lines arrive promptly."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """gzip/brotli for allowlisted content types at or above COMPRESSION_MIN_BYTES.
+
+    Responses that already carry a Content-Encoding (the precompressed catalog)
+    pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(UNCOMPRESSED_TYPES)
+                    or (not more_body and len(body) < COMPRESSION_MIN_BYTES)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    body = compress_body(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["Content-Length"]
+                compressor = StreamCompressor(encoding)
+                await send(start_message)
+            await send({
+                "type": "http.response.body",
+                "body": compressor.chunk(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_compressed)
+
+# ============== CATALOG CACHE ==============
+
+class CatalogCache:
+    """Serialized product responses, kept until an admin write, the TTL, or LRU eviction.
+
+    Readers take ``version`` before querying Mongo and pass it to ``put``; an entry
+    built while a write was in flight is dropped instead of cached stale. Each
+    entry also keeps its gzip/brotli encodings once a client has asked for them.
+    """
+
+    def __init__(self, ttl_seconds: float, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.version = 0
+        self.changed_at = float("-inf")
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._size = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, body, _ = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: str, body: bytes, version: int):
+        if version != self.version or len(body) > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (time.monotonic(), body, {})
+        self._size += len(body)
+        self._evict()
+
+    def encoded(self, key: str, body: bytes, encoding: str) -> Optional[bytes]:
+        """``body`` compressed with ``encoding``, or None if it isn't the cached entry."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] is not body:
+            return None
+        variants = entry[2]
+        if encoding not in variants:
+            variants[encoding] = compress_body(body, encoding, cached=True)
+            self._size += len(variants[encoding])
+            self._evict()
+        return variants[encoding]
+
+    def product_changed(self, product_id: str, product: Optional[dict] = None):
+        """Drop every list body and patch (or drop) the product's own entry."""
+        self.version += 1
+        self.changed_at = time.monotonic()
+        for key in [key for key in self._entries if not key.startswith("product:")]:
+            self._discard(key)
+        self._discard(f"product:{product_id}")
+        if product is not None:
+            self.put(f"product:{product_id}", dump_json(product), self.version)
+
+    def stock_changed(self, product_ids: List[str]):
+        """Drop the products' own entries after checkout moved their stock; list
+        bodies keep serving until the TTL, as they do for other workers' writes."""
+        self.version += 1
+        for product_id in product_ids:
+            self._discard(f"product:{product_id}")
+
+    def clear(self):
+        self.version += 1
+        self.changed_at = time.monotonic()
+        self._entries.clear()
+        self._size = 0
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1]) + sum(len(variant) for variant in entry[2].values())
+
+catalog_cache = CatalogCache(CATALOG_CACHE_TTL_SECONDS, CATALOG_CACHE_MAX_BYTES)
+
+def catalog_read_db():
+    """read_db, except the primary shortly after an admin write here: a lagging
+    secondary could still return the old product, which would then be cached."""
+    if time.monotonic() - catalog_cache.changed_at < MONGO_MAX_STALENESS_SECONDS:
+        return db
+    return read_db
+
+def json_bytes_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+def catalog_response(request: Request, key: str, body: bytes) -> Response:
+    """Serve a cached catalog body, compressed once per encoding rather than per request."""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+        return json_bytes_response(body)
+    encoded = catalog_cache.encoded(key, body, encoding)
+    if encoded is None:
+        # Not cached (a write raced the read); CompressionMiddleware handles it
+        return json_bytes_response(body)
+    return Response(
+        content=encoded,
+        media_type="application/json",
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
+
+# ============== PRODUCT SEARCH ==============
+
+# Hindi spelling variants folded together, after NFD has split nukta forms
+# (क़ -> क + ़) and Latin accents off their base letters
+SEARCH_FOLDS = str.maketrans({
+    "\u0901": "\u0902",  # chandrabindu -> anusvara (चाँद, चांद)
+    "\u0908": "\u0907",  # ई -> इ
+    "\u090A": "\u0909",  # ऊ -> उ
+    "\u0960": "\u090B",  # ॠ -> ऋ
+    "\u0940": "\u093F",  # ी -> ि
+    "\u0942": "\u0941",  # ू -> ु
+    "\u0944": "\u0943",  # ॄ -> ृ
+    "\u090D": "\u090F",  # ऍ -> ए
+    "\u0911": "\u0913",  # ऑ -> ओ
+    "\u0945": "\u0947",  # ॅ -> े
+    "\u0949": "\u094B",  # ॉ -> ो
+    "\u093C": None,  # nukta
+    "\u200C": None,  # ZWNJ
+    "\u200D": None,  # ZWJ
+    **{chr(mark): None for mark in range(0x0300, 0x0370)},  # Latin combining accents
+})
+
+# Letters and digits plus Devanagari vowel signs, virama and anusvara; a plain
+# \w+ would split words at every matra
+SEARCH_TOKEN_RE = re.compile(r"(?:[^\W_]|[\u0900-\u0903\u093A-\u094F\u0951-\u0957\u0962\u0963])+")
+
+def normalize_search_text(text: str) -> str:
+    return unicodedata.normalize("NFD", text).casefold().translate(SEARCH_FOLDS)
+
+def search_tokens(text: str) -> List[str]:
+    return SEARCH_TOKEN_RE.findall(normalize_search_text(text))
+
+class ProductSearchIndex:
+    """Inverted index over product titles and descriptions, ranked with BM25.
+
+    Every query term must match. The last one also matches as a prefix, for
+    typeahead, using a sorted vocabulary.
+    """
+
+    TITLE_WEIGHT = 3.0
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_terms: Dict[str, Dict[str, float]] = {}
+        self.doc_lengths: Dict[str, float] = {}
+        self.total_length = 0.0
+        self.vocabulary: List[str] = []
+
+    def add(self, product_id: str, title: str, description: str):
+        self.remove(product_id)
+        weights: Dict[str, float] = {}
+        for token in search_tokens(title):
+            weights[token] = weights.get(token, 0.0) + self.TITLE_WEIGHT
+        for token in search_tokens(description):
+            weights[token] = weights.get(token, 0.0) + 1.0
+        self.doc_terms[product_id] = weights
+        self.doc_lengths[product_id] = sum(weights.values())
+        self.total_length += self.doc_lengths[product_id]
+        for term, weight in weights.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                bisect.insort(self.vocabulary, term)
+            posting[product_id] = weight
+
+    def remove(self, product_id: str):
+        weights = self.doc_terms.pop(product_id, None)
+        if weights is None:
+            return
+        self.total_length -= self.doc_lengths.pop(product_id)
+        for term in weights:
+            posting = self.postings[term]
+            del posting[product_id]
+            if not posting:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+
+    def _expand(self, token: str, prefix: bool) -> List[str]:
+        if not prefix or len(token) < SEARCH_MIN_PREFIX_LENGTH:
+            return [token] if token in self.postings else []
+        start = bisect.bisect_left(self.vocabulary, token)
+        end = bisect.bisect_left(self.vocabulary, token + "\U0010ffff", start)
+        matches = self.vocabulary[start:end]
+        if len(matches) > SEARCH_PREFIX_EXPANSIONS:
+            matches = heapq.nlargest(SEARCH_PREFIX_EXPANSIONS, matches, key=lambda term: len(self.postings[term]))
+        return matches
+
+    def search(self, query: str, limit: int) -> List[str]:
+        """Ids of the best ``limit`` products for ``query``, best first."""
+        tokens = list(dict.fromkeys(search_tokens(query)))
+        if not tokens or not self.doc_terms:
+            return []
+        typeahead = not query[-1:].isspace()
+        expansions = []
+        for i, token in enumerate(tokens):
+            matches = self._expand(token, prefix=typeahead and i == len(tokens) - 1)
+            if not matches:
+                return []
+            expansions.append(matches)
+
+        candidates = None
+        for matches in sorted(expansions, key=lambda terms: sum(len(self.postings[t]) for t in terms)):
+            matched = set(self.postings[matches[0]]) if len(matches) == 1 else set().union(
+                *(self.postings[term] for term in matches)
+            )
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+
+        doc_count = len(self.doc_terms)
+        average_length = self.total_length / doc_count
+        scores: Dict[str, float] = {}
+        for token, matches in zip(tokens, expansions):
+            for term in matches:
+                posting = self.postings[term]
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                if term != token:
+                    idf *= 0.8  # completions rank below exact words
+                for doc in candidates if len(candidates) < len(posting) else posting:
+                    weight = posting.get(doc)
+                    if weight is None or doc not in candidates:
+                        continue
+                    norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[doc] / average_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * weight * (self.K1 + 1) / (weight + norm)
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+search_index = ProductSearchIndex()
+# (id, title, description) written while a rebuild runs; description None means removed
+search_index_pending: Optional[List[tuple]] = None
+search_index_ready = asyncio.Event()
+# The catalog marker the index reflects; None until the first build
+search_index_marker: Optional[int] = None
+
+def index_product(product: dict):
+    search_index.add(product["id"], product["title"], product["description"])
+    if search_index_pending is not None:
+        search_index_pending.append((product["id"], product["title"], product["description"]))
+
+def unindex_product(product_id: str):
+    search_index.remove(product_id)
+    if search_index_pending is not None:
+        search_index_pending.append((product_id, None, None))
+
+async def mark_catalog_changed():
+    """Bump the shared marker so other workers rebuild their search index.
+
+    Call after the write is already in this worker's index. If nobody else
+    moved the marker since our index was built, our index stays current.
+    """
+    global search_index_marker
+    try:
+        state = await db.catalog_state.find_one_and_update(
+            {"_id": "products"},
+            {"$inc": {"version": 1}},
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if search_index_marker == state["version"] - 1:
+            search_index_marker = state["version"]
+    except PyMongoError:
+        # The write itself succeeded; other workers pick it up on a later change
+        logger.exception("Failed to mark the catalog as changed")
+
+async def catalog_marker() -> int:
+    state = await db.catalog_state.find_one({"_id": "products"})
+    return state["version"] if state else 0
+
+def build_search_index(rows: List[tuple]) -> ProductSearchIndex:
+    index = ProductSearchIndex()
+    for product_id, title, description in rows:
+        index.add(product_id, title, description)
+    return index
+
+async def rebuild_search_index():
+    """Index the whole catalog into a fresh index in a worker thread, then swap it in.
+
+    Admin writes made during the rebuild are replayed onto the new index, so none are lost.
+    """
+    global search_index, search_index_pending
+    search_index_pending = []
+    try:
+        rows = [
+            (product["id"], product["title"], product["description"])
+            async for product in db.products.find({}, {"_id": 0, "id": 1, "title": 1, "description": 1})
+        ]
+        index = await asyncio.get_running_loop().run_in_executor(None, build_search_index, rows)
+        for product_id, title, description in search_index_pending:
+            if description is None:
+                index.remove(product_id)
+            else:
+                index.add(product_id, title, description)
+        search_index = index
+    finally:
+        search_index_pending = None
+    search_index_ready.set()
+
+async def refresh_search_index():
+    global search_index_marker
+    while True:
+        try:
+            # Read before rebuilding: a change made during the rebuild moves it again
+            marker = await catalog_marker()
+            if marker != search_index_marker:
+                await rebuild_search_index()
+                search_index_marker = marker
+        except Exception:
+            logger.exception("Failed to rebuild product search index")
+        await asyncio.sleep(SEARCH_INDEX_REFRESH_SECONDS)
+
+# ============== IDEMPOTENCY ==============
+
+# Completed responses, in front of the idempotency_keys collection
+idempotency_cache = TTLCache(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_CACHE_MAX_ENTRIES)
+# Requests running in this worker, so local duplicates wait instead of polling Mongo
+idempotency_inflight: Dict[str, asyncio.Future] = {}
+
+def replay_idempotent(record: dict, fingerprint: str) -> JSONResponse:
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return JSONResponse(
+        content=record["body"],
+        status_code=record["status_code"],
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+async def claim_idempotency_key(record_id: str, fingerprint: str) -> Optional[dict]:
+    """Take the key for this request, or return the response an earlier request stored.
+
+    A duplicate arriving while another worker holds the key polls until that
+    request finishes; a lease that outlived its worker is taken over.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = datetime.now(timezone.utc)
+        lease = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+        try:
+            await db.idempotency_keys.insert_one({
+                "_id": record_id,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "created_at": now,
+                "leased_until": lease,
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+        record = await db.idempotency_keys.find_one_and_update(
+            {"_id": record_id, "status": "in_progress", "leased_until": {"$lt": now}},
+            {"$set": {"fingerprint": fingerprint, "leased_until": lease}},
+        )
+        if record is not None:
+            return None
+        record = await db.idempotency_keys.find_one({"_id": record_id})
+        if record is None:
+            continue  # released or expired in between; try to insert again
+        if record["status"] == "completed":
+            return record
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+async def run_idempotent(key: Optional[str], user_id: str, scope: str, payload: Any, handler):
+    """Run ``handler`` once per (user, scope, key); repeats get the stored response.
+
+    Client errors are stored and replayed like successes. Server errors release
+    the key so a retry runs the request again.
+    """
+    if not key:
+        return await handler()
+    record_id = f"{user_id}:{scope}:{key}"
+    fingerprint = hashlib.sha256(dump_json(jsonable_encoder(payload))).hexdigest()
+
+    while True:
+        record = idempotency_cache.get(record_id)
+        if record is not None:
+            return replay_idempotent(record, fingerprint)
+        running = idempotency_inflight.get(record_id)
+        if running is None:
+            break
+        await asyncio.shield(running)
+
+    running = asyncio.get_running_loop().create_future()
+    idempotency_inflight[record_id] = running
+    try:
+        record = await claim_idempotency_key(record_id, fingerprint)
+        if record is not None:
+            idempotency_cache.set(record_id, record)
+            return replay_idempotent(record, fingerprint)
+        try:
+            result = await handler()
+        except HTTPException as exc:
+            if exc.status_code >= 500:
+                await db.idempotency_keys.delete_one({"_id": record_id, "status": "in_progress"})
+                raise
+            await store_idempotent(record_id, fingerprint, exc.status_code, {"detail": exc.detail})
+            raise
+        except BaseException:
+            await db.idempotency_keys.delete_one({"_id": record_id, "status": "in_progress"})
+            raise
+        await store_idempotent(record_id, fingerprint, 200, jsonable_encoder(result))
+        return result
+    finally:
+        del idempotency_inflight[record_id]
+        running.set_result(None)
+
+async def store_idempotent(record_id: str, fingerprint: str, status_code: int, body: Any):
+    """Record the response for repeats of this key.
+
+    The request has already run, so a failed write is retried and then the key
+    is released instead of raising; a record left in progress would hold off
+    retries until its lease ran out and then run the request a second time.
+    """
+    record = {"fingerprint": fingerprint, "status_code": status_code, "body": body}
+    idempotency_cache.set(record_id, record)
+    for attempt in range(IDEMPOTENCY_STORE_ATTEMPTS):
+        try:
+            await db.idempotency_keys.update_one(
+                {"_id": record_id},
+                {"$set": {"status": "completed", **record}, "$unset": {"leased_until": ""}},
+            )
+            return
+        except PyMongoError:
+            logger.warning("Failed to store idempotent response for %s (attempt %d)", record_id, attempt + 1)
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS * 2 ** attempt)
+    try:
+        await db.idempotency_keys.delete_one({"_id": record_id, "status": "in_progress"})
+    except PyMongoError:
+        logger.exception("Failed to release idempotency key %s", record_id)
+
+# ============== RATE LIMITING ==============
+
+class TokenBucketLimiter:
+    """Token buckets refilled at ``rate`` per second up to ``burst``, kept for the
+    ``max_keys`` most recently seen keys."""
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @classmethod
+    def from_spec(cls, spec: str, max_keys: int) -> "TokenBucketLimiter":
+        per_minute, _, burst = spec.partition("/")
+        return cls(float(per_minute), int(burst or per_minute), max_keys)
+
+    def hit(self, key: str) -> float:
+        """Take a token; return 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / self.rate
+
+rate_limiters = {
+    route: TokenBucketLimiter.from_spec(spec, RATE_LIMIT_MAX_KEYS) for route, spec in RATE_LIMITS.items()
+}
+
+def client_ip(request: Request) -> str:
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+def enforce_rate_limit(route: str, request: Request, identifier: Optional[str] = None):
+    limiter = rate_limiters[route]
+    retry_after = limiter.hit(f"ip:{client_ip(request)}")
+    if not retry_after and identifier:
+        retry_after = limiter.hit(f"id:{identifier.strip().lower()}")
+    if retry_after:
+        RATE_LIMITED.labels(route).inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+class LoadSheddingMiddleware:
+    """503 with Retry-After once event-loop lag or in-flight requests pass the SHED_* limits."""
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+
+    def shed_tier(self, path: str) -> Optional[str]:
+        if path == "/metrics":
+            return None
+        if event_loop_lag > SHED_HARD_LAG_SECONDS or self.in_flight >= SHED_HARD_MAX_IN_FLIGHT:
+            return "hard"
+        if path in SHEDDABLE_PATHS and (
+            event_loop_lag > SHED_SOFT_LAG_SECONDS or self.in_flight >= SHED_SOFT_MAX_IN_FLIGHT
+        ):
+            return "soft"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tier = self.shed_tier(scope["path"])
+        if tier is not None:
+            SHED_REQUESTS.labels(tier).inc()
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(event_loop_lag)))},
+            )
+            await response(scope, receive, send)
+            return
+        if scope["path"] in LONG_LIVED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
 # ============== AUTH ROUTES ==============
 
 @api_router.post("/auth/signup")
-async def signup(user_data: UserSignup):
+async def signup(user_data: UserSignup, request: Request):
+    enforce_rate_limit("signup", request, user_data.email or user_data.mobile_number)
     # Validate that at least email or mobile is provided
     if not user_data.email and not user_data.mobile_number:
         raise HTTPException(status_code=400, detail="Either email or mobile number is required")
@@ -172,7 +1465,7 @@ async def signup(user_data: UserSignup):
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_pwd = hash_password(user_data.password)
+    hashed_pwd = await hash_password(user_data.password)
     
     user_doc = {
         "id": user_id,
@@ -203,7 +1496,8 @@ async def signup(user_data: UserSignup):
     }
 
 @api_router.post("/auth/login")
-async def login(login_data: UserLogin):
+async def login(login_data: UserLogin, request: Request):
+    enforce_rate_limit("login", request, login_data.identifier)
     # Find user by email or mobile
     user = await db.users.find_one({
         "$or": [
@@ -216,7 +1510,7 @@ async def login(login_data: UserLogin):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Verify password
-    if not verify_password(login_data.password, user["password"]):
+    if not await verify_password(login_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create access token
@@ -246,17 +1540,89 @@ async def get_me(user: dict = Depends(get_current_user)):
 
 # ============== PRODUCT ROUTES ==============
 
-@api_router.get("/products", response_model=List[ProductResponse])
-async def get_products():
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    return products
+@api_router.get("/products", response_model=ProductPage)
+async def get_products(
+    request: Request,
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: Literal["default", "price_asc", "price_desc", "title"] = "default",
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Comma-separated product fields; id is always included"),
+    view: Optional[Literal["full", "card"]] = None,
+):
+    selected = requested_fields(fields, view, PRODUCT_FIELDS, ("id",))
+    shape = ",".join(selected) if selected else view or "full"
+    key = f"products?{category}&{min_price}&{max_price}&{sort}&{cursor}&{limit}&{shape}"
+    body = catalog_cache.get(key)
+    if body is not None:
+        return catalog_response(request, key, body)
+
+    version = catalog_cache.version
+    query: Dict[str, Any] = {}
+    if category:
+        query["category"] = category
+    if min_price is not None or max_price is not None:
+        query["effective_price"] = {}
+        if min_price is not None:
+            query["effective_price"]["$gte"] = min_price
+        if max_price is not None:
+            query["effective_price"]["$lte"] = max_price
+
+    field, direction = PRODUCT_SORTS[sort]
+    sort_keys = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+    if cursor:
+        after = decode_cursor(cursor)
+        if len(after) != len(sort_keys):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            after[-1] = ObjectId(after[-1])
+        except (TypeError, InvalidId):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"$and": [query, keyset_filter(sort_keys, after)]}
+
+    projection = {field: 1 for field in selected} if selected else PRODUCT_VIEWS[view or "full"]
+    projection = {**projection, field: 1}
+    products = await catalog_read_db().products.find(query, projection).sort(sort_keys).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        next_cursor = encode_cursor([last[name] for name, _ in sort_keys[:-1]] + [str(last["_id"])])
+
+    body = dump_json({
+        "products": [trusted_product(product, selected or PRODUCT_FIELDS) for product in products],
+        "next_cursor": next_cursor,
+    })
+    catalog_cache.put(key, body, version)
+    return catalog_response(request, key, body)
+
+@api_router.get("/products/search", response_model=ProductSearchResults)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+):
+    if not search_index_ready.is_set():
+        raise HTTPException(status_code=503, detail="Search is warming up", headers={"Retry-After": "1"})
+    product_ids = search_index.search(q, limit)
+    products = await fetch_products_by_id(product_ids, PRODUCT_RESPONSE_PROJECTION)
+    return json_bytes_response(dump_json({
+        "products": [trusted_product(products[product_id]) for product_id in product_ids if product_id in products],
+    }))
 
 @api_router.get("/products/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+async def get_product(request: Request, product_id: str):
+    key = f"product:{product_id}"
+    body = catalog_cache.get(key)
+    if body is None:
+        version = catalog_cache.version
+        product = await catalog_read_db().products.find_one({"id": product_id}, {"_id": 0, **PRODUCT_RESPONSE_PROJECTION})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = dump_json(trusted_product(product))
+        catalog_cache.put(key, body, version)
+    return catalog_response(request, key, body)
 
 @api_router.post("/admin/products", response_model=ProductResponse)
 async def create_product(product_data: ProductCreate, admin: dict = Depends(get_current_admin)):
@@ -265,36 +1631,390 @@ async def create_product(product_data: ProductCreate, admin: dict = Depends(get_
         "id": product_id,
         **product_data.model_dump()
     }
+    product_doc["effective_price"] = effective_price(product_doc)
     await db.products.insert_one(product_doc)
-    return ProductResponse(id=product_id, **product_data.model_dump())
+    product = ProductResponse(id=product_id, **product_data.model_dump())
+    catalog_cache.product_changed(product_id, product.model_dump())
+    index_product(product_doc)
+    await mark_catalog_changed()
+    return product
 
 @api_router.put("/admin/products/{product_id}", response_model=ProductResponse)
-async def update_product(product_id: str, product_data: ProductCreate, admin: dict = Depends(get_current_admin)):
-    result = await db.products.update_one(
+async def update_product(product_id: str, product_data: ProductUpdate, admin: dict = Depends(get_current_admin)):
+    product_doc = product_data.model_dump()
+    if product_doc["stock"] is None:
+        del product_doc["stock"]
+    product_doc["effective_price"] = effective_price(product_doc)
+    product = await db.products.find_one_and_update(
         {"id": product_id},
-        {"$set": product_data.model_dump()}
+        {"$set": product_doc},
+        projection={"_id": 0, **PRODUCT_RESPONSE_PROJECTION},
+        return_document=ReturnDocument.AFTER,
     )
-    if result.matched_count == 0:
+    if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return ProductResponse(id=product_id, **product_data.model_dump())
+    srcset = product.get("srcset")
+    if srcset and product_doc["image_url"] not in srcset.values():
+        # The uploaded image was replaced by another URL
+        await db.products.update_one({"id": product_id}, {"$unset": {"srcset": ""}})
+        product["srcset"] = None
+    product = trusted_product(product)
+    catalog_cache.product_changed(product_id, product)
+    index_product(product)
+    await mark_catalog_changed()
+    return product
+
+@api_router.post("/admin/products/{product_id}/stock", response_model=ProductResponse)
+async def adjust_product_stock(product_id: str, adjustment: StockAdjustment, admin: dict = Depends(get_current_admin)):
+    """Add (or with a negative delta remove) units without overwriting concurrent checkouts."""
+    query = {"id": product_id}
+    if adjustment.delta < 0:
+        query["stock"] = {"$gte": -adjustment.delta}
+    product = await db.products.find_one_and_update(
+        query,
+        {"$inc": {"stock": adjustment.delta}},
+        projection={"_id": 0, **PRODUCT_RESPONSE_PROJECTION},
+        return_document=ReturnDocument.AFTER,
+    )
+    if product is None:
+        if await db.products.find_one({"id": product_id}, {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=409, detail="Not enough stock to remove")
+    product = trusted_product(product)
+    catalog_cache.product_changed(product_id, product)
+    return product
 
 @api_router.delete("/admin/products/{product_id}")
 async def delete_product(product_id: str, admin: dict = Depends(get_current_admin)):
     result = await db.products.delete_one({"id": product_id})
+    catalog_cache.product_changed(product_id)
+    unindex_product(product_id)
+    await mark_catalog_changed()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
     return {"message": "Product deleted successfully"}
 
+async def iter_body_lines(request: Request):
+    """Lines of a streamed UTF-8 request body, ending with "\n" where the body had one."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in request.stream():
+            lines = (pending + decoder.decode(chunk)).split("\n")
+            pending = lines.pop()
+            if len(pending) > PRODUCT_IMPORT_MAX_RECORD_CHARS:
+                raise HTTPException(
+                    status_code=400, detail=f"Line longer than {PRODUCT_IMPORT_MAX_RECORD_CHARS} characters"
+                )
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body is not valid UTF-8")
+    if pending:
+        yield pending
+
+async def iter_csv_rows(lines):
+    """(row number, column -> value) per CSV record; quoted fields may span lines.
+
+    A record longer than PRODUCT_IMPORT_MAX_RECORD_CHARS is reported as an error
+    and dropped, and parsing resumes with the next line.
+    """
+    header = None
+    record: List[str] = []
+    record_chars = 0
+    quotes = 0
+    row_number = 0
+    async for line in lines:
+        record.append(line)
+        record_chars += len(line)
+        quotes += line.count('"')
+        if record_chars > PRODUCT_IMPORT_MAX_RECORD_CHARS:
+            record, record_chars, quotes = [], 0, 0
+            row_number += 1
+            yield row_number, ValueError(f"record longer than {PRODUCT_IMPORT_MAX_RECORD_CHARS} characters")
+            continue
+        if quotes % 2:
+            continue
+        fields = next(csv.reader(record), [])
+        record, record_chars, quotes = [], 0, 0
+        if not any(field.strip() for field in fields):
+            continue
+        if header is None:
+            header = [field.strip().lower() for field in fields]
+            continue
+        row_number += 1
+        # Empty cells count as left out: the stored value (or the default) stays
+        yield row_number, {name: value for name, value in zip(header, fields) if value != ""}
+    if record:
+        yield row_number + 1, ValueError("unterminated quoted field")
+
+async def iter_ndjson_rows(lines):
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, ValueError("invalid JSON")
+            continue
+        yield row_number, row if isinstance(row, dict) else ValueError("expected a JSON object")
+
+def product_upsert(row: dict, key: str) -> tuple:
+    """Validate an import row into (key value, upsert).
+
+    Only the row's own columns are written; a column it leaves out keeps the
+    stored value, or takes the model default when the product is new. The
+    upsert is a pipeline so effective_price and srcset follow the merged product.
+    """
+    product = ProductCreate.model_validate(row)
+    given = product.model_dump(exclude_unset=True)
+    defaults = {field: value for field, value in product.model_dump().items() if field not in given}
+    pipeline = [
+        {"$set": {field: {"$literal": value} for field, value in given.items()}},
+        {"$set": {
+            **{field: {"$ifNull": [f"${field}", {"$literal": value}]} for field, value in defaults.items()},
+            "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+            "effective_price": EFFECTIVE_PRICE_EXPRESSION,
+        }},
+    ]
+    if "image_url" in given:
+        # Same as update_product: an upload's sizes go once the image is replaced
+        uploaded = {"$map": {"input": {"$objectToArray": {"$ifNull": ["$srcset", {}]}}, "in": "$$this.v"}}
+        pipeline.append({"$set": {"srcset": {"$cond": [{"$in": ["$image_url", uploaded]}, "$srcset", None]}}})
+    if key == "title":
+        return product.title, UpdateOne({"title": product.title}, pipeline, upsert=True)
+    product_id = str(row.get("id") or "").strip() or str(uuid.uuid4())
+    return product_id, UpdateOne({"id": product_id}, pipeline, upsert=True)
+
+def add_import_error(report: dict, row_number: int, error: str):
+    report["error_count"] += 1
+    if len(report["errors"]) < PRODUCT_IMPORT_MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": row_number, "error": error})
+
+async def write_import_batch(batch: List[tuple], key: str, report: dict):
+    """Apply one unordered batch of (row number, key value, upsert) and re-index what it touched."""
+    try:
+        result = (await db.products.bulk_write([op for _, _, op in batch], ordered=False)).bulk_api_result
+    except BulkWriteError as exc:
+        result = exc.details
+        for error in result["writeErrors"]:
+            add_import_error(report, batch[error["index"]][0], error["errmsg"])
+    report["inserted"] += result["nUpserted"]
+    report["updated"] += result["nMatched"]
+
+    keys = [key_value for _, key_value, _ in batch]
+    async for product in db.products.find({key: {"$in": keys}}, {"_id": 0, "id": 1, "title": 1, "description": 1}):
+        index_product(product)
+
+@api_router.post("/admin/products/import")
+async def import_products(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    key: Literal["id", "title"] = "id",
+    admin: dict = Depends(get_current_admin),
+):
+    """Upsert a streamed CSV or NDJSON catalog, matching existing products on ``key``.
+
+    Rows are validated against ProductCreate; rows without an id get a new one.
+    Fields a row leaves out keep their stored values, so a catalog update that
+    omits stock never resets live stock.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("text/csv"):
+            format = "csv"
+        elif content_type.startswith((NDJSON_MEDIA_TYPE, "application/jsonl")):
+            format = "ndjson"
+        else:
+            raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+    lines = iter_body_lines(request)
+    rows = iter_csv_rows(lines) if format == "csv" else iter_ndjson_rows(lines)
+
+    report = {"rows": 0, "inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+    batch: List[tuple] = []
+    try:
+        async for row_number, row in rows:
+            report["rows"] += 1
+            if isinstance(row, Exception):
+                add_import_error(report, row_number, str(row))
+                continue
+            try:
+                batch.append((row_number, *product_upsert(row, key)))
+            except ValidationError as exc:
+                add_import_error(report, row_number, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+                ))
+                continue
+            if len(batch) >= PRODUCT_IMPORT_BATCH_SIZE:
+                await write_import_batch(batch, key, report)
+                batch = []
+        if batch:
+            await write_import_batch(batch, key, report)
+    finally:
+        catalog_cache.clear()
+        await mark_catalog_changed()
+    return report
+
+async def stream_product_export(cursor, format: str):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == "csv":
+        writer.writerow(PRODUCT_EXPORT_FIELDS)
+    try:
+        async for product in cursor:
+            product = trusted_product(product)
+            if format == "csv":
+                writer.writerow([product[field] for field in PRODUCT_EXPORT_FIELDS])
+            else:
+                buffer.write(dump_json(product).decode("utf-8"))
+                buffer.write("\n")
+            if buffer.tell() >= PRODUCT_EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+    finally:
+        await cursor.close()
+
+@api_router.get("/admin/products/export")
+async def export_products(format: Literal["csv", "ndjson"] = "csv", admin: dict = Depends(get_current_admin)):
+    """The whole catalog in the import format, streamed in constant memory."""
+    cursor = db.products.find({}, PRODUCT_RESPONSE_PROJECTION).sort("_id", ASCENDING).batch_size(PRODUCT_IMPORT_BATCH_SIZE)
+    return StreamingResponse(
+        stream_product_export(cursor, format),
+        media_type="text/csv; charset=utf-8" if format == "csv" else NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+# ============== PRODUCT IMAGES ==============
+
+IMAGE_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+IMAGE_MEDIA_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+IMAGE_NAME_RE = re.compile(r"[0-9a-f]{20}-\d+w\.(webp|jpg)")
+
+def image_pool() -> ThreadPoolExecutor:
+    global image_executor
+    if image_executor is None:
+        image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+    return image_executor
+
+def render_image_variants(data: bytes) -> Dict[str, str]:
+    """Resize an upload to IMAGE_WIDTHS (never upscaling) and store each size once.
+
+    Runs in image_pool(); Pillow releases the GIL while resizing and encoding.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    extension = IMAGE_EXTENSIONS[IMAGE_FORMAT]
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if IMAGE_FORMAT == "webp" and image.has_transparency_data else "RGB")
+        widths = [width for width in IMAGE_WIDTHS if width < image.width] + [min(image.width, IMAGE_WIDTHS[-1])]
+        srcset = {}
+        for width in widths:
+            name = f"{digest}-{width}w.{extension}"
+            path = IMAGE_DIR / name
+            if not path.exists():
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+                buffer = io.BytesIO()
+                if IMAGE_FORMAT == "webp":
+                    resized.save(buffer, "WEBP", quality=IMAGE_QUALITY, method=4)
+                else:
+                    resized.save(buffer, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+                IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+                partial = path.with_suffix(f".{uuid.uuid4().hex}.part")
+                partial.write_bytes(buffer.getvalue())
+                os.replace(partial, path)
+            srcset[f"{width}w"] = f"/api/images/{name}"
+    return srcset
+
+@api_router.post("/admin/products/{product_id}/image", response_model=ProductResponse)
+async def upload_product_image(product_id: str, image: UploadFile = File(...), admin: dict = Depends(get_current_admin)):
+    data = await image.read(IMAGE_MAX_UPLOAD_BYTES + 1)
+    if len(data) > IMAGE_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    try:
+        srcset = await asyncio.get_running_loop().run_in_executor(image_pool(), render_image_variants, data)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise HTTPException(status_code=400, detail="Not a supported image")
+
+    product = await db.products.find_one_and_update(
+        {"id": product_id},
+        # The largest size doubles as the plain image_url for older clients
+        {"$set": {"image_url": list(srcset.values())[-1], "srcset": srcset}},
+        projection={"_id": 0, **PRODUCT_RESPONSE_PROJECTION},
+        return_document=ReturnDocument.AFTER,
+    )
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    product = trusted_product(product)
+    catalog_cache.product_changed(product_id, product)
+    return product
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple]:
+    """(start, end) for a single "bytes=" range; () if unsatisfiable; None to send the whole file."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            return (max(0, size - length), size - 1) if length > 0 and size else ()
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    return (start, end) if start <= end and start < size else ()
+
+def read_file_range(path: Path, start: int, end: int) -> bytes:
+    with open(path, "rb") as file:
+        file.seek(start)
+        return file.read(end - start + 1)
+
+@api_router.get("/images/{filename}", include_in_schema=False)
+async def get_image(filename: str, request: Request):
+    match = IMAGE_NAME_RE.fullmatch(filename)
+    path = IMAGE_DIR / filename
+    if match is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+    media_type = IMAGE_MEDIA_TYPES[match.group(1)]
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "Accept-Ranges": "bytes", "ETag": f'"{filename}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    byte_range = parse_byte_range(request.headers.get("range", ""), path.stat().st_size) if "range" in request.headers else None
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    size = path.stat().st_size
+    if not byte_range:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    start, end = byte_range
+    content = await asyncio.get_running_loop().run_in_executor(image_pool(), read_file_range, path, start, end)
+    return Response(
+        content=content,
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+    )
+
 # ============== CART ROUTES ==============
 
 @api_router.get("/cart")
-async def get_cart(user: dict = Depends(get_current_user)):
-    cart_items = user.get("cart", [])
+async def get_cart(user: dict = Depends(get_current_principal)):
+    cart_items = await load_cart(user["id"])
     
     # Fetch product details for cart items
+    products = await fetch_products_by_id(
+        [item["product_id"] for item in cart_items],
+        PRODUCT_RESPONSE_PROJECTION,
+    )
     cart_with_details = []
     for item in cart_items:
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
+        product = products.get(item["product_id"])
         if product:
             cart_with_details.append({
                 "product": product,
@@ -304,66 +2024,184 @@ async def get_cart(user: dict = Depends(get_current_user)):
     return {"cart": cart_with_details}
 
 @api_router.post("/cart")
-async def add_to_cart(cart_item: AddToCart, user: dict = Depends(get_current_user)):
+async def add_to_cart(
+    cart_item: AddToCart,
+    user: dict = Depends(get_current_principal),
+    idempotency_key: Optional[str] = Header(None),
+):
+    return await run_idempotent(
+        idempotency_key, user["id"], "cart", cart_item, lambda: add_cart_item(cart_item, user)
+    )
+
+async def add_cart_item(cart_item: AddToCart, user: dict):
     # Check if product exists
-    product = await db.products.find_one({"id": cart_item.product_id})
+    product = await db.products.find_one({"id": cart_item.product_id}, {"_id": 1})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Update cart
-    cart = user.get("cart", [])
-    
-    # Check if item already in cart
-    existing_item = next((item for item in cart if item["product_id"] == cart_item.product_id), None)
-    
-    if existing_item:
-        existing_item["quantity"] += cart_item.quantity
-    else:
-        cart.append({"product_id": cart_item.product_id, "quantity": cart_item.quantity})
-    
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$set": {"cart": cart}}
-    )
+    # Bump the line if it's already in the cart, otherwise push it; the push is
+    # conditional so a concurrent add can't create a duplicate line
+    in_cart = {"id": user["id"], "cart.product_id": cart_item.product_id}
+    increment = {"$inc": {"cart.$.quantity": cart_item.quantity}}
+    result = await db.users.update_one(in_cart, increment)
+    if result.matched_count == 0:
+        result = await db.users.update_one(
+            {"id": user["id"], "cart.product_id": {"$ne": cart_item.product_id}},
+            {"$push": {"cart": {"product_id": cart_item.product_id, "quantity": cart_item.quantity}}}
+        )
+    if result.matched_count == 0:
+        # Another request pushed the line between our two updates
+        result = await db.users.update_one(in_cart, increment)
+        if result.matched_count == 0:
+            raise HTTPException(status_code=401, detail="User not found")
     
     return {"message": "Item added to cart"}
 
 @api_router.put("/cart/{product_id}")
-async def update_cart_item(product_id: str, quantity: int, user: dict = Depends(get_current_user)):
-    cart = user.get("cart", [])
-    
-    for item in cart:
-        if item["product_id"] == product_id:
-            if quantity <= 0:
-                cart.remove(item)
-            else:
-                item["quantity"] = quantity
-            break
-    
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$set": {"cart": cart}}
-    )
+async def update_cart_item(product_id: str, quantity: int, user: dict = Depends(get_current_principal)):
+    if quantity <= 0:
+        await db.users.update_one(
+            {"id": user["id"]},
+            {"$pull": {"cart": {"product_id": product_id}}}
+        )
+    else:
+        await db.users.update_one(
+            {"id": user["id"], "cart.product_id": product_id},
+            {"$set": {"cart.$.quantity": quantity}}
+        )
     
     return {"message": "Cart updated"}
 
 @api_router.delete("/cart/{product_id}")
-async def remove_from_cart(product_id: str, user: dict = Depends(get_current_user)):
-    cart = user.get("cart", [])
-    cart = [item for item in cart if item["product_id"] != product_id]
-    
+async def remove_from_cart(product_id: str, user: dict = Depends(get_current_principal)):
     await db.users.update_one(
         {"id": user["id"]},
-        {"$set": {"cart": cart}}
+        {"$pull": {"cart": {"product_id": product_id}}}
     )
     
     return {"message": "Item removed from cart"}
 
 # ============== ORDER ROUTES ==============
 
+def reservation_order(tag) -> str:
+    # Tags written before reservations carried quantity and time were the bare order id
+    return tag["order_id"] if isinstance(tag, dict) else tag
+
+async def reserve_stock(order_id: str, lines: List[dict]):
+    """Take stock for every order line in one unordered bulk write, all or nothing.
+
+    Each conditional $inc also tags the product with the order id, so when some
+    lines come up short we can tell exactly which decrements landed and undo only
+    those. No locks or transactions: a hot product is one atomic document update.
+    """
+    if not lines:
+        return
+    reserved_at = datetime.now(timezone.utc)
+    result = await db.products.bulk_write([
+        UpdateOne(
+            {"id": line["product_id"], "stock": {"$gte": line["quantity"]}},
+            {"$inc": {"stock": -line["quantity"]}, "$push": {"reservations": {
+                "order_id": order_id, "quantity": line["quantity"], "reserved_at": reserved_at,
+            }}},
+        )
+        for line in lines
+    ], ordered=False)
+    if result.matched_count == len(lines):
+        catalog_cache.stock_changed([line["product_id"] for line in lines])
+        return
+
+    products = await db.products.find(
+        {"id": {"$in": [line["product_id"] for line in lines]}},
+        {"_id": 0, "id": 1, "stock": 1, "reservations": 1},
+    ).to_list(None)
+    reserved = {
+        product["id"] for product in products
+        if any(reservation_order(tag) == order_id for tag in product.get("reservations", []))
+    }
+    stock = {product["id"]: product.get("stock", 0) for product in products}
+    await release_stock(order_id, [line for line in lines if line["product_id"] in reserved])
+    raise HTTPException(status_code=409, detail={
+        "message": "Some items are out of stock",
+        "out_of_stock": [
+            {
+                "product_id": line["product_id"],
+                "title": line["title"],
+                "requested": line["quantity"],
+                "available": stock.get(line["product_id"], 0),
+            }
+            for line in lines if line["product_id"] not in reserved
+        ],
+    })
+
+async def release_stock(order_id: str, lines: List[dict]):
+    """Give back stock taken by ``reserve_stock`` for ``order_id``."""
+    if lines:
+        await db.products.bulk_write([
+            UpdateOne(
+                {"id": line["product_id"], "reservations.order_id": order_id},
+                {"$inc": {"stock": line["quantity"]}, "$pull": {"reservations": {"order_id": order_id}}},
+            )
+            for line in lines
+        ], ordered=False)
+        catalog_cache.stock_changed([line["product_id"] for line in lines])
+
+async def confirm_stock(order_id: str, lines: List[dict]):
+    """Drop the reservation tags once the order is stored."""
+    if lines:
+        await db.products.update_many(
+            {"id": {"$in": [line["product_id"] for line in lines]}, "reservations.order_id": order_id},
+            {"$pull": {"reservations": {"order_id": order_id}}},
+        )
+
+async def release_abandoned_reservations() -> int:
+    """Settle reservation tags older than STOCK_RESERVATION_TIMEOUT_SECONDS.
+
+    Tags of stored orders only missed confirm_stock and are dropped; the stock
+    of the rest goes back. Returns the number of orders whose stock was released.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=STOCK_RESERVATION_TIMEOUT_SECONDS)
+    stale: Dict[str, list] = {}
+    async for product in db.products.find(
+        {"reservations.reserved_at": {"$lt": cutoff}}, {"_id": 0, "id": 1, "reservations": 1}
+    ):
+        for tag in product["reservations"]:
+            # Read back without tzinfo: the client isn't tz_aware
+            if isinstance(tag, dict) and tag["reserved_at"].replace(tzinfo=timezone.utc) < cutoff:
+                stale.setdefault(tag["order_id"], []).append(
+                    {"product_id": product["id"], "quantity": tag["quantity"]}
+                )
+    if not stale:
+        return 0
+    stored = {order["id"] async for order in db.orders.find({"id": {"$in": list(stale)}}, {"_id": 0, "id": 1})}
+    for order_id, lines in stale.items():
+        if order_id in stored:
+            await confirm_stock(order_id, lines)
+        else:
+            logger.warning("Releasing stock reserved by abandoned checkout %s", order_id)
+            await release_stock(order_id, lines)
+    return len(stale) - len(stored)
+
+async def release_abandoned_reservations_periodically():
+    while True:
+        try:
+            if await claim_job_lease("stock_reservations", STOCK_RESERVATION_SWEEP_SECONDS):
+                await release_abandoned_reservations()
+        except Exception:
+            logger.exception("Failed to release abandoned stock reservations")
+        await asyncio.sleep(STOCK_RESERVATION_SWEEP_SECONDS)
+
 @api_router.post("/orders", response_model=OrderResponse)
-async def create_order(order_data: OrderCreate, user: dict = Depends(get_current_user)):
-    cart = user.get("cart", [])
+async def create_order(
+    order_data: OrderCreate,
+    user: dict = Depends(get_current_principal),
+    idempotency_key: Optional[str] = Header(None),
+):
+    return await run_idempotent(
+        idempotency_key, user["id"], "orders", order_data, lambda: place_order(order_data, user)
+    )
+
+async def place_order(order_data: OrderCreate, user: dict):
+    cart = await load_cart(user["id"])
     
     if not cart:
         raise HTTPException(status_code=400, detail="Cart is empty")
@@ -372,20 +2210,26 @@ async def create_order(order_data: OrderCreate, user: dict = Depends(get_current
     order_products = []
     total_amount = 0
     
+    products = await fetch_products_by_id(
+        [item["product_id"] for item in cart],
+        {"title": 1, "sale_price": 1, "original_price": 1, "category": 1},
+    )
     for item in cart:
-        product = await db.products.find_one({"id": item["product_id"]})
+        product = products.get(item["product_id"])
         if product:
-            price = product.get("sale_price") or product["original_price"]
+            price = effective_price(product)
             order_products.append({
                 "product_id": item["product_id"],
                 "title": product["title"],
                 "quantity": item["quantity"],
-                "price": price
+                "price": price,
+                "category": product["category"]
             })
             total_amount += price * item["quantity"]
     
     # Create order
     order_id = str(uuid.uuid4())
+    await reserve_stock(order_id, order_products)
     order_doc = {
         "id": order_id,
         "user_id": user["id"],
@@ -397,46 +2241,885 @@ async def create_order(order_data: OrderCreate, user: dict = Depends(get_current
         "order_date": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.orders.insert_one(order_doc)
+    try:
+        await db.orders.insert_one(order_doc)
+    except Exception:
+        await release_stock(order_id, order_products)
+        raise
+    await confirm_stock(order_id, order_products)
+    await apply_rollups(order_created_rollups(order_doc))
     
-    # Clear cart
+    # Clear the lines that were ordered; anything added or changed meanwhile stays
     await db.users.update_one(
         {"id": user["id"]},
-        {"$set": {"cart": []}}
+        {"$pull": {"cart": {"$in": cart}}}
     )
     
     return OrderResponse(**order_doc)
 
-@api_router.get("/orders", response_model=List[OrderResponse])
-async def get_user_orders(user: dict = Depends(get_current_user)):
-    orders = await db.orders.find({"user_id": user["id"]}, {"_id": 0}).to_list(1000)
-    return orders
+ORDER_SORT = [("order_date", DESCENDING), ("id", DESCENDING)]
+
+async def stream_orders(orders):
+    try:
+        async for order in orders:
+            yield orjson.dumps(order, option=orjson.OPT_APPEND_NEWLINE)
+    finally:
+        await orders.aclose()
+
+def archive_cutoff() -> str:
+    """order_date before which an order may be in orders_archive."""
+    return (datetime.now(timezone.utc) - timedelta(days=ORDER_ARCHIVE_AFTER_DAYS)).isoformat()
+
+async def next_or_none(cursor) -> Optional[dict]:
+    try:
+        return await cursor.next()
+    except StopAsyncIteration:
+        return None
+
+async def order_history(database, query: dict, projection: dict, limit: Optional[int] = None, batch_size: int = 0):
+    """Orders matching ``query`` in ORDER_SORT order, from orders and orders_archive.
+
+    Orders newer than archive_cutoff() can only be in the hot collection, so the
+    archive is queried (and merged in) only once the walk gets past them.
+    """
+    cutoff = archive_cutoff()
+    hot = database.orders.find(query, projection, batch_size=batch_size).sort(ORDER_SORT)
+    archive = None
+    if limit is not None:
+        hot = hot.limit(limit)
+    sent = 0
+    try:
+        order = await next_or_none(hot)
+        while order is not None and order["order_date"] >= cutoff:
+            yield order
+            sent += 1
+            if sent == limit:
+                return
+            order = await next_or_none(hot)
+
+        archive = database.orders_archive.find(query, projection, batch_size=batch_size).sort(ORDER_SORT)
+        if limit is not None:
+            archive = archive.limit(limit - sent)
+        archived = await next_or_none(archive)
+        while order is not None or archived is not None:
+            if archived is None or (
+                order is not None and (order["order_date"], order["id"]) >= (archived["order_date"], archived["id"])
+            ):
+                if archived is not None and order["id"] == archived["id"]:
+                    # Mid-move: copied to the archive but not yet deleted here
+                    archived = await next_or_none(archive)
+                yield order
+                order = await next_or_none(hot)
+            else:
+                yield archived
+                archived = await next_or_none(archive)
+            sent += 1
+            if sent == limit:
+                return
+    finally:
+        await hot.close()
+        if archive is not None:
+            await archive.close()
+
+def order_list_projection(fields: Optional[str], view: Optional[str]) -> dict:
+    # id and order_date are the page cursor, so they are always returned
+    selected = requested_fields(fields, view, ORDER_FIELDS, ("id", "order_date"))
+    return order_projection(selected) if selected else ORDER_VIEWS[view or "full"]
 
-@api_router.get("/admin/orders", response_model=List[OrderResponse])
-async def get_all_orders(admin: dict = Depends(get_current_admin)):
-    orders = await db.orders.find({}, {"_id": 0}).to_list(1000)
-    return orders
+async def list_orders(
+    request: Request,
+    query: dict,
+    cursor: Optional[str],
+    limit: Optional[int],
+    database=None,
+    projection: dict = ORDER_RESPONSE_PROJECTION,
+):
+    """One page of orders newest first, or every order after ``cursor`` as NDJSON."""
+    if cursor:
+        after = decode_cursor(cursor)
+        if len(after) != len(ORDER_SORT):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"$and": [query, keyset_filter(ORDER_SORT, after)]}
+    database = database or db
+
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        orders = order_history(database, query, projection, limit, ORDER_STREAM_BATCH_SIZE)
+        return StreamingResponse(stream_orders(orders), media_type=NDJSON_MEDIA_TYPE)
+
+    limit = min(limit or ORDER_PAGE_SIZE, ORDER_PAGE_MAX_SIZE)
+    page = [order async for order in order_history(database, query, projection, limit + 1)]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor([page[-1]["order_date"], page[-1]["id"]])
+    return json_bytes_response(dump_json({"orders": page, "next_cursor": next_cursor}))
+
+@api_router.get("/orders", response_model=OrderPage)
+async def get_user_orders(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = Query(None, description="Comma-separated order fields; id and order_date are always included"),
+    view: Optional[Literal["full", "summary"]] = None,
+    user: dict = Depends(get_current_principal),
+):
+    projection = order_list_projection(fields, view)
+    # A just-placed order may take up to MONGO_MAX_STALENESS_SECONDS to show up here
+    return await list_orders(request, {"user_id": user["id"]}, cursor, limit, read_db, projection)
+
+@api_router.get("/admin/orders", response_model=OrderPage)
+async def get_all_orders(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = Query(None, description="Comma-separated order fields; id and order_date are always included"),
+    view: Optional[Literal["full", "summary"]] = None,
+    admin: dict = Depends(get_current_admin),
+):
+    return await list_orders(request, {}, cursor, limit, projection=order_list_projection(fields, view))
 
 @api_router.put("/admin/orders/{order_id}/status")
 async def update_order_status(order_id: str, status: str, admin: dict = Depends(get_current_admin)):
-    valid_statuses = ["Pending", "Shipped", "Delivered", "Cancelled"]
-    if status not in valid_statuses:
+    if status not in ORDER_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    result = await db.orders.update_one(
+    previous = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": {"status": status}}
+        {"$set": {"status": status}},
+        projection={"_id": 0, "status": 1, "order_date": 1, "products": 1, "total_amount": 1},
+        return_document=ReturnDocument.BEFORE,
     )
     
-    if result.matched_count == 0:
+    if previous is None:
+        if await db.orders_archive.find_one({"id": order_id}, {"_id": 1}):
+            raise HTTPException(status_code=409, detail="Archived orders can't be changed")
         raise HTTPException(status_code=404, detail="Order not found")
+    await apply_rollups(status_change_rollups([previous], status))
+    order_feed.status_changed([order_id], status)
     
     return {"message": "Order status updated"}
 
+@api_router.post("/admin/orders/status", response_model=BulkOrderStatusResult)
+async def bulk_update_order_status(update: BulkOrderStatusUpdate, admin: dict = Depends(get_current_admin)):
+    """Move many orders, given by id or by filter, to one status.
+
+    Each order is only changed from the status it was read with, so the
+    rollups stay exact; orders changed by someone else meanwhile come back as
+    "conflict", and orders already archived as "archived".
+    """
+    if update.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    if (update.order_ids is None) == (update.filter is None):
+        raise HTTPException(status_code=400, detail="Send either order_ids or filter")
+
+    projection = {"_id": 0, "id": 1, "status": 1, "order_date": 1, "products": 1, "total_amount": 1}
+    if update.order_ids is not None:
+        order_ids = list(dict.fromkeys(update.order_ids))
+        orders = await db.orders.find({"id": {"$in": order_ids}}, projection).to_list(None)
+        more = False
+    else:
+        query: Dict[str, Any] = {}
+        if update.filter.status is not None:
+            if update.filter.status not in ORDER_STATUSES:
+                raise HTTPException(status_code=400, detail="Invalid status")
+            query["status"] = update.filter.status
+        if update.filter.before is not None:
+            before = update.filter.before
+            if before.tzinfo is None:
+                before = before.replace(tzinfo=timezone.utc)
+            query["order_date"] = {"$lt": before.astimezone(timezone.utc).isoformat()}
+        if not query:
+            raise HTTPException(status_code=400, detail="Filter needs a status or a before date")
+        orders = await (
+            db.orders.find(query, projection).sort("order_date", ASCENDING).limit(BULK_STATUS_MAX_ORDERS + 1)
+        ).to_list(None)
+        more = len(orders) > BULK_STATUS_MAX_ORDERS
+        orders = orders[:BULK_STATUS_MAX_ORDERS]
+        order_ids = [order["id"] for order in orders]
+
+    moving = [order for order in orders if order["status"] != update.status]
+    changed = moving
+    if moving:
+        batch = str(uuid.uuid4())
+        ids_by_status: Dict[str, list] = {}
+        for order in moving:
+            ids_by_status.setdefault(order["status"], []).append(order["id"])
+        result = await db.orders.bulk_write([
+            UpdateMany({"id": {"$in": ids}, "status": status}, {"$set": {"status": update.status, "status_batch": batch}})
+            for status, ids in ids_by_status.items()
+        ], ordered=False)
+        if result.modified_count < len(moving):
+            # Some orders changed status after we read them; keep only the ones this batch moved
+            moved_ids = {
+                order["id"] async for order in db.orders.find(
+                    {"id": {"$in": [order["id"] for order in moving]}, "status_batch": batch}, {"_id": 0, "id": 1}
+                )
+            }
+            changed = [order for order in moving if order["id"] in moved_ids]
+        await apply_rollups(status_change_rollups(changed, update.status))
+        order_feed.status_changed([order["id"] for order in changed], update.status)
+
+    results = {order_id: "not_found" for order_id in order_ids}
+    results.update({order["id"]: "unchanged" if order["status"] == update.status else "conflict" for order in orders})
+    results.update({order["id"]: "updated" for order in changed})
+    # Orders missing here, or gone by the time they were written, may have been archived
+    unresolved = [order_id for order_id, result in results.items() if result in ("not_found", "conflict")]
+    if unresolved:
+        async for order in db.orders_archive.find({"id": {"$in": unresolved}}, {"_id": 0, "id": 1}):
+            results[order["id"]] = "archived"
+    return {"matched": len(orders), "updated": len(changed), "more": more, "results": results}
+
+# ============== ORDER FEED ==============
+
+# Change stream events the feed turns into deltas; everything else (rollup
+# bookkeeping, archiving deletes) is filtered out inside Mongo
+ORDER_FEED_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": "insert"},
+        {"operationType": "update", "updateDescription.updatedFields.status": {"$exists": True}},
+    ]}},
+    # Inserts carry the order in its response shape, status updates just its id
+    {"$project": {
+        "operationType": 1,
+        "updateDescription.updatedFields.status": 1,
+        "fullDocument": {"$cond": [
+            {"$eq": ["$operationType", "insert"]},
+            {
+                **{field: f"$fullDocument.{field}" for field in ORDER_FIELDS if field != "products"},
+                "products": {"$map": {
+                    "input": "$fullDocument.products",
+                    "as": "line",
+                    "in": {field: f"$$line.{field}" for field in OrderProduct.model_fields},
+                }},
+            },
+            {"id": "$fullDocument.id"},
+        ]},
+    }},
+]
+TAIL_SORT = [("order_date", ASCENDING), ("id", ASCENDING)]
+TAIL_EVENT_PREFIX = "t:"
+
+def order_change_event(change: dict) -> tuple:
+    """(event id, delta) for a change stream event; the id is its resume token."""
+    event_id = change["_id"]["_data"]
+    if change["operationType"] == "insert":
+        return event_id, {"type": "order_created", "order": change["fullDocument"]}
+    order = change.get("fullDocument") or {}
+    return event_id, {
+        "type": "order_status",
+        "id": order.get("id"),
+        "status": change["updateDescription"]["updatedFields"]["status"],
+    }
+
+def order_tail_event(order: dict) -> tuple:
+    event_id = TAIL_EVENT_PREFIX + encode_cursor([order["order_date"], order["id"]])
+    return event_id, {"type": "order_created", "order": order}
+
+def change_stream_lost(exc: OperationFailure) -> bool:
+    """A change stream error that resuming can't fix: 280 ChangeStreamFatalError,
+    286 ChangeStreamHistoryLost (the token fell off the oplog)."""
+    return exc.code in (280, 286) or exc.has_error_label("NonResumableChangeStreamError")
+
+class OrderFeed:
+    """One order watcher per worker, fanned out to every connected admin.
+
+    The watcher runs only while someone is subscribed. Each subscriber gets a
+    bounded queue of (event id, delta); ``None`` in the queue means it fell
+    too far behind and should reconnect with its last event id.
+    """
+
+    def __init__(self):
+        self.subscribers: set = set()
+        self.mode: Optional[str] = None  # "changestream" or "tail" once the watcher has started
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token: Optional[dict] = None
+        self._tail_newest: Optional[str] = None
+        self._tail_seen: Dict[str, str] = {}  # order id -> order_date, within the grace window
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(ORDER_FEED_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        ORDER_FEED_SUBSCRIBERS.set(len(self.subscribers))
+        if self._task is None or self._task.done():
+            # A fresh watcher starts from now; reconnecting clients replay their own gaps
+            self._resume_token = self._tail_newest = None
+            self._tail_seen = {}
+            self._task = asyncio.create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        ORDER_FEED_SUBSCRIBERS.set(len(self.subscribers))
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, event_id: Optional[str], event: dict):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait((event_id, event))
+            except asyncio.QueueFull:
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        ORDER_FEED_SUBSCRIBERS.set(len(self.subscribers))
+
+    def status_changed(self, order_ids: List[str], status: str):
+        """Status deltas for tail mode, which only sees inserts; change streams see updates themselves.
+
+        Without a change stream, only admins connected to the worker that made
+        the change hear about it.
+        """
+        if self.mode != "tail":
+            return
+        for order_id in order_ids:
+            self.publish(None, {"type": "order_status", "id": order_id, "status": status})
+
+    async def _watch(self):
+        while True:
+            try:
+                if ORDER_FEED_MODE != "tail" and self.mode != "tail":
+                    try:
+                        await self._watch_changes()
+                    except OperationFailure as exc:
+                        if self._resume_token is not None and change_stream_lost(exc):
+                            # Retrying the same token would fail forever; start
+                            # from now and have clients reload what they missed
+                            logger.warning("Order feed resume token no longer valid; restarting from now")
+                            self._resume_token = None
+                            self.publish(None, {"type": "reset"})
+                            continue
+                        # 40573: change streams need a replica set or sharded cluster
+                        if ORDER_FEED_MODE == "changestream" or exc.code != 40573:
+                            raise
+                        logger.info("Change streams unavailable, tailing orders by order_date")
+                await self._tail_orders()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Order feed watcher failed; restarting")
+                await asyncio.sleep(ORDER_FEED_POLL_SECONDS)
+
+    async def _watch_changes(self):
+        async with db.orders.watch(
+            ORDER_FEED_PIPELINE, full_document="updateLookup", resume_after=self._resume_token
+        ) as stream:
+            self.mode = "changestream"
+            async for change in stream:
+                self._resume_token = change["_id"]
+                self.publish(*order_change_event(change))
+
+    async def _tail_orders(self):
+        self.mode = "tail"
+        announce = self._tail_newest is not None
+        if not announce:
+            self._tail_newest = datetime.now(timezone.utc).isoformat()
+        while True:
+            floor = (datetime.fromisoformat(self._tail_newest) - timedelta(seconds=ORDER_FEED_TAIL_GRACE_SECONDS)).isoformat()
+            orders = db.orders.find({"order_date": {"$gte": floor}}, ORDER_RESPONSE_PROJECTION).sort(TAIL_SORT)
+            async for order in orders:
+                if order["id"] in self._tail_seen:
+                    continue
+                self._tail_seen[order["id"]] = order["order_date"]
+                self._tail_newest = max(self._tail_newest, order["order_date"])
+                if announce:
+                    self.publish(*order_tail_event(order))
+            # The first pass only records what already existed when the feed started
+            announce = True
+            self._tail_seen = {order_id: date for order_id, date in self._tail_seen.items() if date >= floor}
+            await asyncio.sleep(ORDER_FEED_POLL_SECONDS)
+
+    async def replay(self, last_event_id: str):
+        """Events after ``last_event_id``, read from Mongo; yields a reset when they can't all be replayed."""
+        replayed = 0
+        try:
+            if last_event_id.startswith(TAIL_EVENT_PREFIX):
+                after = decode_cursor(last_event_id[len(TAIL_EVENT_PREFIX):])
+                if len(after) != len(TAIL_SORT):
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+                cursor = db.orders.find(keyset_filter(TAIL_SORT, after), ORDER_RESPONSE_PROJECTION).sort(TAIL_SORT)
+                async for order in cursor.limit(ORDER_FEED_REPLAY_LIMIT + 1):
+                    replayed += 1
+                    if replayed > ORDER_FEED_REPLAY_LIMIT:
+                        break
+                    yield order_tail_event(order)
+            elif self.mode == "tail":
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            else:
+                async with db.orders.watch(
+                    ORDER_FEED_PIPELINE, full_document="updateLookup", resume_after={"_data": last_event_id}
+                ) as stream:
+                    # try_next returns None once the private stream has caught up to now
+                    while replayed <= ORDER_FEED_REPLAY_LIMIT:
+                        change = await stream.try_next()
+                        if change is None:
+                            return
+                        replayed += 1
+                        if replayed <= ORDER_FEED_REPLAY_LIMIT:
+                            yield order_change_event(change)
+        except (HTTPException, OperationFailure):
+            # Unknown, malformed or expired token (e.g. ChangeStreamHistoryLost)
+            yield None, {"type": "reset"}
+            return
+        if replayed > ORDER_FEED_REPLAY_LIMIT:
+            yield None, {"type": "reset"}
+
+order_feed = OrderFeed()
+
+def sse_message(event_id: Optional[str], event: dict) -> bytes:
+    head = f"id: {event_id}\n".encode() if event_id else b""
+    return head + b"data: " + orjson.dumps(event, default=str) + b"\n\n"
+
+async def stream_order_feed(last_event_id: Optional[str]):
+    queue = order_feed.subscribe()
+    try:
+        yield f"retry: {int(ORDER_FEED_POLL_SECONDS * 1000) + 1000}\n\n".encode()
+        replayed = set()
+        if last_event_id:
+            # Subscribed first, so nothing published during the replay is missed;
+            # the replayed events that also reach the queue are skipped below
+            async for event_id, event in order_feed.replay(last_event_id):
+                replayed.add(event_id)
+                yield sse_message(event_id, event)
+        # Starlette cancels this generator when the client disconnects
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), ORDER_FEED_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if item is None:
+                return
+            event_id, event = item
+            if event_id is not None and event_id in replayed:
+                continue
+            yield sse_message(event_id, event)
+    finally:
+        order_feed.unsubscribe(queue)
+
+@api_router.get("/admin/orders/feed")
+async def admin_order_feed(
+    last_event_id: Optional[str] = Header(None),
+    admin: dict = Depends(get_current_admin),
+):
+    """Server-Sent Events: order_created and order_status deltas, resumable with Last-Event-ID.
+
+    A ``reset`` event means the gap since Last-Event-ID could not be replayed;
+    reload /admin/orders and keep listening.
+    """
+    return StreamingResponse(
+        stream_order_feed(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ============== ORDER ARCHIVE ==============
+
+JOB_OWNER = uuid.uuid4().hex
+
+async def claim_job_lease(name: str, seconds: float) -> bool:
+    """Take (or extend our own) lease on a periodic job, so one worker runs it at a time."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.job_leases.update_one(
+            {"_id": name, "$or": [{"leased_until": {"$lt": now}}, {"owner": JOB_OWNER}]},
+            {"$set": {"owner": JOB_OWNER, "leased_until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def archive_order_batch(cutoff: str) -> int:
+    """Move up to ORDER_ARCHIVE_BATCH_SIZE finished orders older than ``cutoff``.
+
+    Copy first, then delete: a run that dies in between leaves orders in both
+    collections (history reads skip the duplicate) and the next run copies them
+    again harmlessly.
+    """
+    orders = await db.orders.find(
+        {"status": {"$in": ORDER_ARCHIVE_STATUSES}, "order_date": {"$lt": cutoff}}
+    ).sort("order_date", ASCENDING).limit(ORDER_ARCHIVE_BATCH_SIZE).to_list(None)
+    if not orders:
+        return 0
+    await db.orders_archive.bulk_write(
+        [ReplaceOne({"_id": order["_id"]}, order, upsert=True) for order in orders], ordered=False
+    )
+    order_ids = [order["id"] for order in orders]
+    result = await db.orders.delete_many({"id": {"$in": order_ids}, "status": {"$in": ORDER_ARCHIVE_STATUSES}})
+    if result.deleted_count < len(order_ids):
+        # Reopened since we read them; the hot copy stays the only one
+        reopened = [order["id"] async for order in db.orders.find({"id": {"$in": order_ids}}, {"_id": 0, "id": 1})]
+        await db.orders_archive.delete_many({"id": {"$in": reopened}})
+    ORDERS_ARCHIVED.inc(result.deleted_count)
+    return len(orders)
+
+async def archive_orders() -> int:
+    cutoff = archive_cutoff()
+    archived = 0
+    while True:
+        moved = await archive_order_batch(cutoff)
+        archived += moved
+        if moved < ORDER_ARCHIVE_BATCH_SIZE or not await claim_job_lease("order_archive", ORDER_ARCHIVE_INTERVAL_SECONDS):
+            break
+    if archived:
+        logger.info("Archived %d orders placed before %s", archived, cutoff)
+    return archived
+
+async def archive_orders_periodically():
+    while True:
+        try:
+            if await claim_job_lease("order_archive", ORDER_ARCHIVE_INTERVAL_SECONDS):
+                await archive_orders()
+        except Exception:
+            logger.exception("Failed to archive orders")
+        await asyncio.sleep(ORDER_ARCHIVE_INTERVAL_SECONDS)
+
+# ============== ANALYTICS ROUTES ==============
+
+# sales_rollups holds one small document per day, product, status and category.
+# Orders update them incrementally; Cancelled orders don't count towards sales.
+# Days are UTC dates of order_date.
+
+def sales_rollups(orders: List[dict], sign: int) -> List[UpdateOne]:
+    """Upserts adding (sign=1) or removing (sign=-1) the orders' sales, one per rollup document."""
+    days: Dict[str, list] = {}
+    products: Dict[str, list] = {}
+    categories: Dict[str, list] = {}
+    for order in orders:
+        totals = days.setdefault(order["order_date"][:10], [0.0, 0, 0])
+        totals[0] += order["total_amount"]
+        totals[1] += 1
+        order_categories = set()
+        for line in order["products"]:
+            quantity, revenue = line["quantity"], line["quantity"] * line["price"]
+            totals[2] += quantity
+            product = products.setdefault(line["product_id"], [0, 0.0, line["title"]])
+            product[0] += quantity
+            product[1] += revenue
+            category = line.get("category", "Uncategorized")
+            category_totals = categories.setdefault(category, [0, 0, 0.0])
+            if category not in order_categories:
+                order_categories.add(category)
+                category_totals[0] += 1
+            category_totals[1] += quantity
+            category_totals[2] += revenue
+
+    # A rebuild keeps documents created after it started (see rebuild_analytics)
+    created_at = datetime.now(timezone.utc)
+    updates = [
+        UpdateOne(
+            {"_id": f"day:{day}"},
+            {"$inc": {"revenue": sign * revenue, "orders": sign * count, "units": sign * units},
+             "$setOnInsert": {"kind": "day", "date": day, "created_at": created_at}},
+            upsert=True,
+        )
+        for day, (revenue, count, units) in days.items()
+    ]
+    updates += [
+        UpdateOne(
+            {"_id": f"product:{product_id}"},
+            {"$inc": {"units": sign * units, "revenue": sign * revenue},
+             "$set": {"title": title},
+             "$setOnInsert": {"kind": "product", "product_id": product_id, "created_at": created_at}},
+            upsert=True,
+        )
+        for product_id, (units, revenue, title) in products.items()
+    ]
+    updates += [
+        UpdateOne(
+            {"_id": f"category:{category}"},
+            {"$inc": {"orders": sign * count, "units": sign * units, "revenue": sign * revenue},
+             "$setOnInsert": {"kind": "category", "category": category, "created_at": created_at}},
+            upsert=True,
+        )
+        for category, (count, units, revenue) in categories.items()
+    ]
+    return updates
+
+def status_count_rollup(status: str, delta: int) -> UpdateOne:
+    return UpdateOne(
+        {"_id": f"status:{status}"},
+        {"$inc": {"orders": delta},
+         "$setOnInsert": {"kind": "status", "status": status, "created_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+def order_created_rollups(order: dict) -> List[UpdateOne]:
+    return [status_count_rollup(order["status"], 1), *sales_rollups([order], 1)]
+
+def status_change_rollups(orders: List[dict], new_status: str) -> List[UpdateOne]:
+    """Rollup changes for moving ``orders`` (with their old status) to ``new_status``."""
+    moved = [order for order in orders if order["status"] != new_status]
+    if not moved:
+        return []
+    left: Dict[str, int] = {}
+    for order in moved:
+        left[order["status"]] = left.get(order["status"], 0) + 1
+    updates = [status_count_rollup(status, -count) for status, count in left.items()]
+    updates.append(status_count_rollup(new_status, len(moved)))
+    if new_status == "Cancelled":
+        updates += sales_rollups(moved, -1)
+    else:
+        restored = [order for order in moved if order["status"] == "Cancelled"]
+        if restored:
+            updates += sales_rollups(restored, 1)
+    return updates
+
+async def apply_rollups(updates: List[UpdateOne]):
+    # The order write already succeeded; a missed rollup is fixed by a rebuild
+    if not updates:
+        return
+    try:
+        await db.sales_rollups.bulk_write(updates, ordered=False)
+    except PyMongoError:
+        logger.exception("Failed to update sales rollups")
+
+def rollup_pipelines(rebuild: str) -> List[list]:
+    """Aggregations over orders and orders_archive that recompute every rollup document,
+    stamping each with ``rebuild``."""
+    every = [{"$unionWith": "orders_archive"}]
+    sold = every + [{"$match": {"status": {"$ne": "Cancelled"}}}]
+    lines = sold + [{"$unwind": "$products"}]
+    merge = {"$merge": {"into": "sales_rollups", "whenMatched": "replace"}}
+    return [
+        sold + [
+            {"$group": {
+                "_id": {"$substrCP": ["$order_date", 0, 10]},
+                "revenue": {"$sum": "$total_amount"},
+                "orders": {"$sum": 1},
+                "units": {"$sum": {"$sum": "$products.quantity"}},
+            }},
+            {"$project": {"_id": {"$concat": ["day:", "$_id"]}, "kind": "day", "date": "$_id",
+                          "revenue": 1, "orders": 1, "units": 1, "rebuild": rebuild}},
+            merge,
+        ],
+        lines + [
+            {"$group": {
+                "_id": "$products.product_id",
+                "title": {"$last": "$products.title"},
+                "units": {"$sum": "$products.quantity"},
+                "revenue": {"$sum": {"$multiply": ["$products.quantity", "$products.price"]}},
+            }},
+            {"$project": {"_id": {"$concat": ["product:", "$_id"]}, "kind": "product", "product_id": "$_id",
+                          "title": 1, "units": 1, "revenue": 1, "rebuild": rebuild}},
+            merge,
+        ],
+        every + [
+            {"$group": {"_id": "$status", "orders": {"$sum": 1}}},
+            {"$project": {"_id": {"$concat": ["status:", "$_id"]}, "kind": "status", "status": "$_id",
+                          "orders": 1, "rebuild": rebuild}},
+            merge,
+        ],
+        lines + [
+            # Orders placed before lines carried a category take the product's current one
+            {"$lookup": {"from": "products", "localField": "products.product_id", "foreignField": "id",
+                         "as": "product"}},
+            {"$group": {
+                "_id": {"category": {"$ifNull": [
+                    "$products.category", {"$arrayElemAt": ["$product.category", 0]}, "Uncategorized"
+                ]}, "order": "$id"},
+                "units": {"$sum": "$products.quantity"},
+                "revenue": {"$sum": {"$multiply": ["$products.quantity", "$products.price"]}},
+            }},
+            {"$group": {
+                "_id": "$_id.category",
+                "orders": {"$sum": 1},
+                "units": {"$sum": "$units"},
+                "revenue": {"$sum": "$revenue"},
+            }},
+            {"$project": {"_id": {"$concat": ["category:", "$_id"]}, "kind": "category", "category": "$_id",
+                          "orders": 1, "units": 1, "revenue": 1, "rebuild": rebuild}},
+            merge,
+        ],
+    ]
+
+@api_router.post("/admin/analytics/rebuild")
+async def rebuild_analytics(admin: dict = Depends(get_current_admin)):
+    # Replace documents in place, then drop the ones no order produced any more
+    # (e.g. a day whose orders were all cancelled); the dashboard never sees an
+    # empty or half-built collection. Documents that live order writes created
+    # after the rebuild started are kept: the pipelines may not have seen them
+    started = datetime.now(timezone.utc)
+    rebuild = uuid.uuid4().hex
+    for pipeline in rollup_pipelines(rebuild):
+        await db.orders.aggregate(pipeline).to_list(None)
+    await db.sales_rollups.delete_many({
+        "rebuild": {"$ne": rebuild},
+        "$or": [{"created_at": {"$lt": started}}, {"created_at": {"$exists": False}}],
+    })
+    return {"message": "Analytics rebuilt"}
+
+@api_router.get("/admin/analytics/revenue", response_model=List[RevenueDay])
+async def get_revenue_by_day(
+    start: Optional[str] = Query(None, description="First day, YYYY-MM-DD (UTC)"),
+    end: Optional[str] = Query(None, description="Last day, YYYY-MM-DD (UTC)"),
+    admin: dict = Depends(get_current_admin),
+):
+    query: Dict[str, Any] = {"kind": "day"}
+    if start or end:
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = start
+        if end:
+            query["date"]["$lte"] = end
+    return await db.sales_rollups.find(query, {"_id": 0}).sort("date", ASCENDING).to_list(None)
+
+@api_router.get("/admin/analytics/products", response_model=List[ProductSales])
+async def get_product_sales(
+    limit: int = Query(20, ge=1, le=500),
+    admin: dict = Depends(get_current_admin),
+):
+    return await db.sales_rollups.find({"kind": "product"}, {"_id": 0}).sort(
+        "units", DESCENDING
+    ).limit(limit).to_list(limit)
+
+@api_router.get("/admin/analytics/orders", response_model=OrderBreakdown)
+async def get_order_breakdown(admin: dict = Depends(get_current_admin)):
+    rollups = await db.sales_rollups.find({"kind": {"$in": ["status", "category"]}}, {"_id": 0}).to_list(None)
+    return {
+        "by_status": {rollup["status"]: rollup["orders"] for rollup in rollups if rollup["kind"] == "status"},
+        "by_category": sorted(
+            (rollup for rollup in rollups if rollup["kind"] == "category"),
+            key=lambda rollup: rollup["revenue"],
+            reverse=True,
+        ),
+    }
+
 # ============== CONTACT ROUTE ==============
 
+class ContactWriteBuffer:
+    """Write-behind queue for contact submissions, flushed with insert_many.
+
+    A batch is written once CONTACT_BATCH_SIZE submissions are waiting or
+    CONTACT_FLUSH_INTERVAL_SECONDS after its first one. Failed writes are retried
+    until they succeed, so while Mongo is down the queue fills and submit()
+    starts refusing with 503 instead of growing without bound.
+    """
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: List[tuple] = []
+
+    def start(self):
+        self.queue = asyncio.Queue(CONTACT_QUEUE_MAX)
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, contact: dict):
+        if self._task is None:  # not running (startup, shutdown): write through
+            await db.contacts.insert_one(contact)
+            return
+        waiter = None if CONTACT_DURABILITY == "buffered" else asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((contact, waiter))
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put((contact, waiter)), CONTACT_ENQUEUE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many messages right now, please retry",
+                    headers={"Retry-After": str(max(1, math.ceil(CONTACT_FLUSH_INTERVAL_SECONDS)))},
+                )
+        CONTACT_BUFFER_PENDING.set(self.queue.qsize())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), CONTACT_ACK_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                # Still queued and will be written; the client may resend a duplicate
+                raise HTTPException(status_code=503, detail="Message could not be saved yet, please retry")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Collected in self._writing so close() can still flush a half-built batch
+            batch = self._writing = [await self.queue.get()]
+            deadline = loop.time() + CONTACT_FLUSH_INTERVAL_SECONDS
+            while len(batch) < CONTACT_BATCH_SIZE:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            CONTACT_BUFFER_PENDING.set(self.queue.qsize())
+            try:
+                await self._write(batch)
+            except Exception:
+                # Not a database error, so retrying won't help; keep the flusher alive
+                logger.exception("Dropped %d contact submissions", len(batch))
+                self._fail(batch)
+            self._writing = []
+
+    @staticmethod
+    def _fail(batch: List[tuple]):
+        for _, waiter in batch:
+            if waiter is not None and not waiter.done():
+                waiter.set_exception(HTTPException(status_code=503, detail="Message could not be saved"))
+
+    async def _write(self, batch: List[tuple], attempts: Optional[int] = None):
+        # insert_many stamps each document's _id before sending, so a retry after
+        # an ambiguous failure only hits duplicate keys for what already landed
+        contacts = db.contacts
+        if CONTACT_DURABILITY == "journaled":
+            contacts = contacts.with_options(write_concern=WriteConcern(j=True))
+        documents = [contact for contact, _ in batch]
+        delay = 0.1
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await contacts.insert_many(documents, ordered=False)
+                break
+            except BulkWriteError as exc:
+                if not exc.details.get("writeConcernErrors") and all(
+                    error["code"] == 11000 for error in exc.details["writeErrors"]
+                ):
+                    break
+                error = exc
+            except PyMongoError as exc:
+                error = exc
+            if attempts is not None and attempt >= attempts:
+                raise error
+            logger.warning("Failed to write %d contact submissions, retrying: %s", len(batch), error)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+        for _, waiter in batch:
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+    async def close(self):
+        """Stop the flusher and write whatever is still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        remaining = self._writing
+        while not self.queue.empty():
+            remaining.append(self.queue.get_nowait())
+        self._writing = []
+        if not remaining:
+            return
+        try:
+            await asyncio.wait_for(self._write(remaining, attempts=3), CONTACT_SHUTDOWN_TIMEOUT_SECONDS)
+        except (PyMongoError, asyncio.TimeoutError):
+            logger.error(
+                "Dropped %d buffered contact submissions on shutdown: %s",
+                len(remaining),
+                json.dumps([contact for contact, _ in remaining], default=str, ensure_ascii=False),
+            )
+            self._fail(remaining)
+        CONTACT_BUFFER_PENDING.set(0)
+
+contact_buffer = ContactWriteBuffer()
+
 @api_router.post("/contact")
-async def submit_contact(contact_data: ContactForm):
+async def submit_contact(contact_data: ContactForm, request: Request):
+    enforce_rate_limit("contact", request, contact_data.email)
     contact_doc = {
         "id": str(uuid.uuid4()),
         "name": contact_data.name,
@@ -444,13 +3127,14 @@ async def submit_contact(contact_data: ContactForm):
         "message": contact_data.message,
         "submitted_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.contacts.insert_one(contact_doc)
+    await contact_buffer.submit(contact_doc)
     return {"message": "Message sent successfully"}
 
 # ============== INIT ROUTE ==============
 
 @api_router.post("/init")
-async def initialize_data():
+async def initialize_data(request: Request):
+    enforce_rate_limit("init", request)
     # Check if admin exists
     admin = await db.users.find_one({"role": "admin"})
     if not admin:
@@ -460,7 +3144,7 @@ async def initialize_data():
             "username": "Admin",
             "email": "admin@anukriti.com",
             "mobile_number": "9876543210",
-            "password": hash_password("Admin@123"),
+            "password": await hash_password("Admin@123"),
             "role": "admin",
             "cart": [],
             "addresses": []
@@ -532,13 +3216,92 @@ async def initialize_data():
                 "stock": 80
             }
         ]
+        for product in sample_products:
+            product["effective_price"] = effective_price(product)
         await db.products.insert_many(sample_products)
+        catalog_cache.clear()
+        for product in sample_products:
+            index_product(product)
+        await mark_catalog_changed()
     
     return {"message": "Data initialized successfully"}
 
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def ensure_indexes(database):
+    for collection, indexes in INDEXES.items():
+        try:
+            await database[collection].create_indexes(indexes)
+        except OperationFailure:
+            # Usually duplicate legacy data blocking a unique index; keep serving.
+            logger.exception("Failed to create indexes on %s", collection)
+
+async def warm_up_database(database):
+    """Ping and open MONGO_MIN_POOL_SIZE connections before traffic arrives, so
+    the first requests after a deploy don't pay for connection handshakes."""
+    started = time.perf_counter()
+    connections = max(1, MONGO_MIN_POOL_SIZE)
+    try:
+        await asyncio.gather(*(database.command("ping") for _ in range(connections)))
+    except PyMongoError:
+        logger.exception("MongoDB warmup ping failed")
+        return
+    logger.info("MongoDB warmed up %d connections in %.0f ms", connections, (time.perf_counter() - started) * 1000)
+
+background_tasks: List[asyncio.Task] = []
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, read_db, password_executor, image_executor
+    if client is None:  # tests and benchmarks may install their own client first
+        client = create_mongo_client()
+        db = client[os.environ['DB_NAME']]
+    read_db = secondary_read_db(db)
+    if MONGO_WARMUP:
+        await warm_up_database(db)
+    await backfill_effective_price(db)
+    await ensure_indexes(db)
+    background_tasks.append(asyncio.create_task(refresh_search_index()))
+    background_tasks.append(asyncio.create_task(measure_event_loop_lag()))
+    background_tasks.append(asyncio.create_task(release_abandoned_reservations_periodically()))
+    if ORDER_ARCHIVE_ENABLED:
+        background_tasks.append(asyncio.create_task(archive_orders_periodically()))
+    contact_buffer.start()
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        background_tasks.clear()
+        await contact_buffer.close()
+        client.close()
+        client = db = read_db = None
+        if password_executor is not None:
+            password_executor.shutdown(wait=False)
+            password_executor = None
+        if image_executor is not None:
+            image_executor.shutdown(wait=False)
+            image_executor = None
+
+# Create the main app without a prefix
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
+
+app.add_middleware(LoadSheddingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -546,14 +3309,3 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
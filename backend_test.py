@@ -127,7 +127,7 @@ class AnukritiEcommerceAPITester:
         success, response = self.make_request('GET', 'products', expected_status=200)
         
         if success:
-            products = response.json()
+            products = response.json()['products']
             if len(products) > 0:
                 self.test_product_id = products[0]['id']
                 self.log_test("Get All Products", True)
@@ -216,7 +216,7 @@ class AnukritiEcommerceAPITester:
             # Test get user orders
             success2, response2 = self.make_request('GET', 'orders', headers=headers, expected_status=200)
             if success2:
-                orders = response2.json()
+                orders = response2.json()['orders']
                 if len(orders) > 0:
                     self.log_test("Get User Orders", True)
                 else:
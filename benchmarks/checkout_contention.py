@@ -0,0 +1,106 @@
+"""Flash-sale checkout benchmark: many buyers racing for one hot product.
+
+Calls create_order concurrently against a throwaway database on a local mongod
+and prints throughput, latency percentiles and an oversell check as JSON:
+
+    python benchmarks/checkout_contention.py --buyers 2000 --stock 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--buyers", type=int, default=2000)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--quantity", type=int, default=1, help="units of the hot product per cart")
+    parser.add_argument("--concurrency", type=int, default=100)
+    return parser.parse_args()
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {"p50": None, "p95": None, "p99": None}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+async def run(args):
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ.setdefault("DB_NAME", "anukriti_bench")
+    from fastapi import HTTPException
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    import server
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    db_name = f"anukriti_bench_{uuid.uuid4().hex[:8]}"
+    server.db = client[db_name]
+    try:
+        await server.ensure_indexes(server.db)
+        await server.db.products.insert_one({
+            "id": "hot", "title": "Flash sale", "description": "", "original_price": 100.0,
+            "sale_price": None, "effective_price": 100.0, "category": "Book", "stock": args.stock,
+        })
+        buyers = [f"buyer-{i}" for i in range(args.buyers)]
+        await server.db.users.insert_many([
+            {"id": buyer, "role": "user", "cart": [{"product_id": "hot", "quantity": args.quantity}]}
+            for buyer in buyers
+        ])
+        order = server.OrderCreate(shipping_address=server.ShippingAddress(
+            full_name="Bench", address="1 Road", city="Delhi", state="Delhi",
+            postal_code="110001", mobile_number="9000000000",
+        ))
+
+        gate = asyncio.Semaphore(args.concurrency)
+        latencies, outcomes = [], {"placed": 0, "out_of_stock": 0}
+
+        async def checkout(buyer):
+            async with gate:
+                started = time.perf_counter()
+                try:
+                    await server.place_order(order, {"id": buyer, "role": "user"})
+                    outcomes["placed"] += 1
+                except HTTPException as exc:
+                    if exc.status_code != 409:
+                        raise
+                    outcomes["out_of_stock"] += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(checkout(buyer) for buyer in buyers))
+        elapsed = time.perf_counter() - started
+
+        final_stock = (await server.db.products.find_one({"id": "hot"}))["stock"]
+        sold = outcomes["placed"] * args.quantity
+        return {
+            "benchmark": "checkout_contention",
+            "buyers": args.buyers,
+            "concurrency": args.concurrency,
+            "initial_stock": args.stock,
+            "elapsed_s": elapsed,
+            "checkouts_per_s": args.buyers / elapsed,
+            "latency_ms": percentiles(latencies),
+            **outcomes,
+            "final_stock": final_stock,
+            "oversold": final_stock < 0 or sold + final_stock != args.stock,
+        }
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    report = asyncio.run(run(parse_args()))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["oversold"] else 0)
@@ -0,0 +1,80 @@
+"""Latency of the first requests after a deploy, with and without the Mongo warmup.
+
+Starts server.py twice against a throwaway database on a local mongod, once
+with MONGO_WARMUP=false and once with it on. Each time it waits only for the
+process to accept connections, then fires one burst of concurrent uncached
+catalog reads and prints the burst's latency percentiles as JSON:
+
+    python benchmarks/cold_start.py --burst 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import load_test
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--burst", type=int, default=50, help="concurrent requests in the first burst")
+    return parser.parse_args()
+
+
+async def first_burst(base_url, process, burst):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=burst)) as http:
+        started = time.perf_counter()
+        while True:
+            if process.poll() is not None:
+                raise SystemExit(f"server exited with status {process.returncode}")
+            try:
+                # /metrics never touches Mongo, so this only waits for startup
+                if (await http.get("/metrics")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+        ready_s = time.perf_counter() - started
+
+        async def timed(limit):
+            # A distinct limit per request misses the catalog cache and goes to Mongo
+            started = time.perf_counter()
+            response = await http.get("/api/products", params={"limit": limit})
+            response.raise_for_status()
+            return (time.perf_counter() - started) * 1000
+
+        latencies = await asyncio.gather(*(timed(limit) for limit in range(1, burst + 1)))
+    return {"ready_s": ready_s, "latency_ms": load_test.percentiles(latencies)}
+
+
+def run(args, warmup):
+    os.environ["MONGO_WARMUP"] = "true" if warmup else "false"
+    db_name = f"anukriti_bench_{uuid.uuid4().hex[:8]}"
+    process, base_url = load_test.start_server(argparse.Namespace(mongo_url=args.mongo_url, stand_in=False), db_name)
+    try:
+        return asyncio.run(first_burst(base_url, process, args.burst))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        from pymongo import MongoClient
+
+        with MongoClient(args.mongo_url) as client:
+            client.drop_database(db_name)
+
+
+def main(args):
+    return {
+        "benchmark": "cold_start",
+        "burst": args.burst,
+        "without_warmup": run(args, warmup=False),
+        "with_warmup": run(args, warmup=True),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(parse_args()), indent=2))
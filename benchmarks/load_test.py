@@ -0,0 +1,368 @@
+"""Mixed-workload HTTP load test: browse, cart, checkout, login bursts and admin listing.
+
+Starts backend/server.py under uvicorn against a throwaway database on a local
+mongod (or, with --stand-in, an in-process mongomock-motor database inside the
+server process; needs mongomock-motor installed), drives it with concurrent
+virtual users and prints per-route latency percentiles and requests per second
+as JSON:
+
+    python benchmarks/load_test.py --users 50 --duration 30 --output before.json
+    python benchmarks/load_test.py --users 50 --duration 30 --compare before.json
+
+--url points the load generator at an already running server instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+ADMIN_LOGIN = {"identifier": "admin@anukriti.com", "password": "Admin@123"}
+SHIPPING_ADDRESS = {
+    "full_name": "Bench", "address": "1 Road", "city": "Delhi", "state": "Delhi",
+    "postal_code": "110001", "mobile_number": "9000000000",
+}
+WORDS = ["कहानी", "कविता", "उपन्यास", "यात्रा", "इतिहास", "संस्कृति", "प्रेम", "गाँव", "शहर", "बचपन"]
+CATEGORIES = ["Book", "Magazine", "Novel"]
+DEFAULT_MIX = "browse=60,cart=15,checkout=10,login=10,admin=5"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--stand-in", action="store_true", help="serve from an in-process mongomock-motor database")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. browse=80,checkout=20")
+    parser.add_argument("--products", type=int, default=200, help="extra products created before the run")
+    parser.add_argument("--login-burst", type=int, default=5, help="simultaneous logins per login scenario")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--compare", help="report changes against an earlier report")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name.strip()!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {"p50": None, "p95": None, "p99": None, "max": max(samples, default=None)}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": max(samples)}
+
+
+# ---------------------------------------------------------------- server
+
+def serve(args):
+    """Child process: run the app under uvicorn, optionally on mongomock-motor."""
+    import uvicorn
+
+    import server
+
+    if args.stand_in:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[os.environ["DB_NAME"]]
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, db_name):
+    port = free_port()
+    env = {"TRUSTED_PROXY_HOPS": "1", **os.environ, "MONGO_URL": args.mongo_url, "DB_NAME": db_name}
+    command = [sys.executable, str(Path(__file__).resolve()), "--serve", "--port", str(port)]
+    if args.stand_in:
+        command.append("--stand-in")
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env), f"http://127.0.0.1:{port}"
+
+
+async def wait_until_ready(http, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"server exited with status {process.returncode}")
+        try:
+            if (await http.get("/api/products", params={"limit": 1})).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("server did not become ready")
+
+
+# ---------------------------------------------------------------- load
+
+class Recorder:
+    """Latencies and status codes per route template, once ``recording`` is on."""
+
+    def __init__(self, http):
+        self.http = http
+        self.recording = False
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def request(self, route, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except Exception as exc:
+            response, status = None, type(exc).__name__
+        if self.recording:
+            self.latencies[route].append((time.perf_counter() - started) * 1000)
+            self.statuses[route][status] += 1
+        return response
+
+
+class VirtualUser:
+    def __init__(self, recorder, rng, fixture, account):
+        self.recorder = recorder
+        self.rng = rng
+        self.fixture = fixture
+        self.auth = {"Authorization": f"Bearer {account['token']}", **account["headers"]}
+
+    def product_id(self):
+        return self.rng.choice(self.fixture["product_ids"])
+
+    async def browse(self):
+        params = {"limit": 24, "sort": self.rng.choice(["default", "price_asc", "title"])}
+        if self.rng.random() < 0.5:
+            params["category"] = self.rng.choice(CATEGORIES)
+        response = await self.recorder.request("GET /api/products", "GET", "/api/products", params=params)
+        if response is not None and response.status_code == 200 and response.json()["next_cursor"]:
+            params["cursor"] = response.json()["next_cursor"]
+            await self.recorder.request("GET /api/products?cursor", "GET", "/api/products", params=params)
+        await self.recorder.request(
+            "GET /api/products/search", "GET", "/api/products/search", params={"q": self.rng.choice(WORDS)}
+        )
+        await self.recorder.request("GET /api/products/{product_id}", "GET", f"/api/products/{self.product_id()}")
+
+    async def cart(self):
+        product_id = self.product_id()
+        await self.recorder.request(
+            "POST /api/cart", "POST", "/api/cart", headers=self.auth, json={"product_id": product_id, "quantity": 1}
+        )
+        await self.recorder.request("GET /api/cart", "GET", "/api/cart", headers=self.auth)
+        await self.recorder.request(
+            "PUT /api/cart/{product_id}", "PUT", f"/api/cart/{product_id}", headers=self.auth, params={"quantity": 2}
+        )
+        await self.recorder.request(
+            "DELETE /api/cart/{product_id}", "DELETE", f"/api/cart/{product_id}", headers=self.auth
+        )
+
+    async def checkout(self):
+        for _ in range(self.rng.randint(1, 3)):
+            await self.recorder.request(
+                "POST /api/cart", "POST", "/api/cart", headers=self.auth,
+                json={"product_id": self.product_id(), "quantity": 1},
+            )
+        await self.recorder.request(
+            "POST /api/orders", "POST", "/api/orders",
+            headers={**self.auth, "Idempotency-Key": str(uuid.uuid4())},
+            json={"shipping_address": SHIPPING_ADDRESS},
+        )
+        await self.recorder.request("GET /api/orders", "GET", "/api/orders", headers=self.auth)
+
+    async def login(self):
+        accounts = self.rng.sample(self.fixture["accounts"], min(self.fixture["login_burst"], len(self.fixture["accounts"])))
+        await asyncio.gather(*(
+            self.recorder.request(
+                "POST /api/auth/login", "POST", "/api/auth/login",
+                headers=account["headers"],
+                json={"identifier": account["mobile_number"], "password": account["password"]},
+            )
+            for account in accounts
+        ))
+
+    async def admin(self):
+        admin = self.fixture["admin_auth"]
+        await self.recorder.request("GET /api/admin/orders", "GET", "/api/admin/orders", headers=admin, params={"limit": 50})
+        await self.recorder.request("GET /api/products?limit=200", "GET", "/api/products", params={"limit": 200})
+        await self.recorder.request("GET /api/admin/analytics/revenue", "GET", "/api/admin/analytics/revenue", headers=admin)
+
+    async def run(self, mix, deadline):
+        names, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(names, weights)[0])()
+
+
+SCENARIOS = ("browse", "cart", "checkout", "login", "admin")
+
+
+async def prepare(http, args, rng):
+    """Seed the catalog, an admin session and one account per virtual user."""
+    await http.post("/api/init")
+    response = await http.post("/api/auth/login", json=ADMIN_LOGIN)
+    response.raise_for_status()
+    admin_auth = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    for i in range(args.products):
+        price = rng.randint(50, 900)
+        response = await http.post("/api/admin/products", headers=admin_auth, json={
+            "title": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+            "description": " ".join(rng.choices(WORDS, k=60)),
+            "original_price": price,
+            "sale_price": price * 0.8 if i % 3 == 0 else None,
+            "category": rng.choice(CATEGORIES),
+            "stock": 10 ** 7,
+        })
+        response.raise_for_status()
+
+    product_ids, cursor = [], None
+    while True:
+        params = {"limit": 200, **({"cursor": cursor} if cursor else {})}
+        page = (await http.get("/api/products", params=params)).json()
+        product_ids += [product["id"] for product in page["products"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    run_id = uuid.uuid4().hex[:6]
+    accounts = []
+    for i in range(args.users):
+        account = {
+            "username": f"bench-{run_id}-{i}",
+            "email": f"bench-{run_id}-{i}@example.com",
+            "mobile_number": f"7{run_id[:3]}{i:06d}",
+            "password": "Bench@123",
+        }
+        # Each virtual user is its own client as far as the per-IP rate limits go
+        headers = {"X-Forwarded-For": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"}
+        response = await http.post("/api/auth/signup", json=account, headers=headers)
+        response.raise_for_status()
+        accounts.append({**account, "headers": headers, "token": response.json()["access_token"]})
+    return {"admin_auth": admin_auth, "product_ids": product_ids, "accounts": accounts, "login_burst": args.login_burst}
+
+
+async def drive(args, base_url, process=None):
+    import httpx
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.users * max(args.login_burst, 1))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as http:
+        await wait_until_ready(http, process)
+        fixture = await prepare(http, args, rng)
+        recorder = Recorder(http)
+        users = [
+            VirtualUser(recorder, random.Random(rng.random()), fixture, account)
+            for account in fixture["accounts"]
+        ]
+        deadline = time.perf_counter() + args.warmup + args.duration
+
+        async def measure():
+            await asyncio.sleep(args.warmup)
+            recorder.recording = True
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            recorder.recording = False
+            return time.perf_counter() - started
+
+        elapsed, *_ = await asyncio.gather(measure(), *(user.run(mix, deadline) for user in users))
+
+    routes = {}
+    for route in sorted(recorder.latencies):
+        samples = recorder.latencies[route]
+        errors = sum(count for status, count in recorder.statuses[route].items() if not status.startswith("2"))
+        routes[route] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "errors": errors,
+            "latency_ms": percentiles(samples),
+            "statuses": dict(recorder.statuses[route]),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "benchmark": "load_test",
+        "mode": "external" if args.url else "stand-in" if args.stand_in else "mongod",
+        "users": args.users,
+        "duration_s": elapsed,
+        "mix": mix,
+        "total": {
+            "requests": total,
+            "rps": total / elapsed,
+            "errors": sum(route["errors"] for route in routes.values()),
+            "latency_ms": percentiles([ms for samples in recorder.latencies.values() for ms in samples]),
+        },
+        "routes": routes,
+    }
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def compare(report, baseline):
+    """Percent change of throughput and latency per route against ``baseline``."""
+    changes = {}
+    for route, stats in {"total": report["total"], **report["routes"]}.items():
+        previous = baseline["total"] if route == "total" else baseline["routes"].get(route)
+        if previous is None:
+            continue
+        changes[route] = {
+            "rps_pct": change(previous["rps"], stats["rps"]),
+            **{f"{cut}_pct": change(previous["latency_ms"][cut], stats["latency_ms"][cut]) for cut in ("p50", "p95", "p99")},
+        }
+    return changes
+
+
+def main(args):
+    if args.url:
+        return asyncio.run(drive(args, args.url))
+
+    db_name = f"anukriti_bench_{uuid.uuid4().hex[:8]}"
+    process, base_url = start_server(args, db_name)
+    try:
+        return asyncio.run(drive(args, base_url, process))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        if not args.stand_in:
+            from pymongo import MongoClient
+
+            with MongoClient(args.mongo_url) as client:
+                client.drop_database(db_name)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.serve:
+        serve(args)
+        sys.exit(0)
+    report = main(args)
+    if args.compare:
+        report["compare"] = compare(report, json.loads(Path(args.compare).read_text()))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
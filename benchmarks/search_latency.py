@@ -0,0 +1,86 @@
+"""Product search latency on a synthetic Hindi catalog (no database needed).
+
+Builds the in-memory ProductSearchIndex over generated titles and
+descriptions, then times word, multi-word and typeahead-prefix queries:
+
+    python benchmarks/search_latency.py --products 100000
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+CONSONANTS = "कखगघचछजझटठडढतथदधनपफबभमयरलवशसह"
+MATRAS = ["", "ा", "ि", "ी", "ु", "ू", "े", "ै", "ो", "ौ", "ं"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def make_word(rng):
+    return "".join(rng.choice(CONSONANTS) + rng.choice(MATRAS) for _ in range(rng.randint(2, 4)))
+
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": max(samples)}
+
+
+def main(args):
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "anukriti_bench")
+    import server
+
+    rng = random.Random(args.seed)
+    vocabulary = list({make_word(rng) for _ in range(args.vocabulary)})
+    # Zipf-ish word frequencies, like real text
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+    def text(words):
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+    catalog = [(f"p{i}", text(3), text(20)) for i in range(args.products)]
+    index = server.ProductSearchIndex()
+    started = time.perf_counter()
+    for product_id, title, description in catalog:
+        index.add(product_id, title, description)
+    build_s = time.perf_counter() - started
+
+    kinds = {
+        "word": lambda: rng.choice(vocabulary),
+        "two_words": lambda: f"{rng.choice(vocabulary)} {rng.choice(vocabulary[:500])}",
+        "prefix": lambda: rng.choice(vocabulary)[:server.SEARCH_MIN_PREFIX_LENGTH],
+    }
+    report = {
+        "benchmark": "search_latency",
+        "products": args.products,
+        "terms": len(index.postings),
+        "build_s": build_s,
+        "latency_ms": {},
+    }
+    for kind, make_query in kinds.items():
+        samples = []
+        for _ in range(args.queries):
+            query = make_query()
+            started = time.perf_counter()
+            index.search(query, 20)
+            samples.append((time.perf_counter() - started) * 1000)
+        report["latency_ms"][kind] = percentiles(samples)
+    return report
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(parse_args()), indent=2, ensure_ascii=False))
@@ -0,0 +1,111 @@
+"""Per-item cost of serializing product and order lists (no database needed).
+
+Compares the old path, where FastAPI validates every item through the response
+model and encodes with the stdlib json module, against the trusted path, where
+projected documents go straight to orjson:
+
+    python benchmarks/serialization.py --items 50 200 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def make_product(rng, i):
+    price = float(rng.randint(100, 900))
+    return {
+        "_id": f"{i:024x}", "id": f"product-{i}", "title": "हिंदी साहित्य संग्रह", "description": "कहानियाँ और कविताएँ " * 8,
+        "original_price": price, "sale_price": price * 0.8 if i % 3 else None, "effective_price": price,
+        "image_url": f"https://example.com/covers/{i}.jpg", "category": "Book", "stock": rng.randint(0, 50),
+    }
+
+
+def make_order(rng, i):
+    lines = [
+        {"product_id": f"product-{rng.randint(0, 999)}", "title": "हिंदी साहित्य संग्रह", "quantity": rng.randint(1, 3),
+         "price": 299.0, "category": "Book"}
+        for _ in range(rng.randint(1, 4))
+    ]
+    return {
+        "id": f"order-{i}", "user_id": "user-1", "products": lines,
+        "total_amount": sum(line["price"] * line["quantity"] for line in lines),
+        "shipping_address": {"full_name": "राम", "address": "1 Road", "city": "Delhi", "state": "Delhi",
+                             "postal_code": "110001", "mobile_number": "9000000000"},
+        "payment_mode": "COD", "status": "Pending", "order_date": f"2024-01-01T00:00:{i % 60:02d}+00:00",
+    }
+
+
+def per_item_us(func, items, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat / items * 1e6
+
+
+def main(args):
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "anukriti_bench")
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    import server
+
+    loop = asyncio.new_event_loop()
+    rng = random.Random(args.seed)
+    routes = {
+        "products": (server.ProductResponse, make_product, None),
+        "orders": (server.OrderResponse, make_order, server.ORDER_RESPONSE_PROJECTION),
+    }
+    report = {"benchmark": "serialization", "per_item_us": {}}
+    for name, (model, make, projection) in routes.items():
+        field = create_response_field(name="Response", type_=List[model])
+        for items in args.items:
+            docs = [make(rng, i) for i in range(items)]
+
+            def validated():
+                content = loop.run_until_complete(serialize_response(field=field, response_content=docs))
+                json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+            if projection is None:
+                def trusted():
+                    server.dump_json([server.trusted_product(doc) for doc in docs])
+            else:
+                # What ORDER_RESPONSE_PROJECTION returns: order lines without their category
+                line_fields = server.OrderProduct.model_fields
+                projected = [
+                    {**doc, "products": [{key: line[key] for key in line_fields} for line in doc["products"]]}
+                    for doc in docs
+                ]
+
+                def trusted():
+                    server.dump_json(projected)
+
+            before = per_item_us(validated, items, args.repeat)
+            after = per_item_us(trusted, items, args.repeat)
+            report["per_item_us"][f"{name}[{items}]"] = {
+                "validated_json": round(before, 3),
+                "trusted_orjson": round(after, 3),
+                "speedup": round(before / after, 1),
+            }
+    loop.close()
+    return report
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(parse_args()), indent=2))
@@ -4,3 +4,15 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+
+// Uploaded product images are served by the backend under relative /api URLs
+export function imageUrl(url) {
+  return url && url.startsWith('/') ? `${BACKEND_URL}${url}` : url;
+}
+
+export function imageSrcSet(srcset) {
+  if (!srcset) return undefined;
+  return Object.entries(srcset).map(([width, url]) => `${imageUrl(url)} ${width}`).join(', ');
+}
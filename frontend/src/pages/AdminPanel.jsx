@@ -4,6 +4,7 @@ import Navbar from '@/components/Navbar';
 import Footer from '@/components/Footer';
 import { toast } from 'sonner';
 import { Plus, Edit, Trash2, Package } from 'lucide-react';
+import { imageUrl, imageSrcSet } from '@/lib/utils';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -12,6 +13,7 @@ const AdminPanel = () => {
   const [activeTab, setActiveTab] = useState('products'); // 'products' or 'orders'
   const [products, setProducts] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [showProductModal, setShowProductModal] = useState(false);
   const [editingProduct, setEditingProduct] = useState(null);
   const [productForm, setProductForm] = useState({
@@ -29,23 +31,89 @@ const AdminPanel = () => {
     fetchOrders();
   }, []);
 
+  // Live order deltas over Server-Sent Events. fetch() instead of EventSource
+  // so the bearer token goes in a header; reconnects resume from Last-Event-ID.
+  useEffect(() => {
+    const controller = new AbortController();
+    let lastEventId = null;
+
+    const applyOrderEvent = (event) => {
+      if (event.type === 'order_created') {
+        setOrders(current => current.some(order => order.id === event.order.id) ? current : [event.order, ...current]);
+      } else if (event.type === 'order_status') {
+        setOrders(current => current.map(order => order.id === event.id ? { ...order, status: event.status } : order));
+      } else if (event.type === 'reset') {
+        fetchOrders();
+      }
+    };
+
+    const listen = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          const token = localStorage.getItem('token');
+          const response = await fetch(`${API}/admin/orders/feed`, {
+            headers: {
+              Authorization: `Bearer ${token}`,
+              ...(lastEventId ? { 'Last-Event-ID': lastEventId } : {})
+            },
+            signal: controller.signal
+          });
+          if (!response.ok) throw new Error(`Order feed returned ${response.status}`);
+          const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+          let buffer = '';
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            const messages = buffer.split('\n\n');
+            buffer = messages.pop();
+            messages.forEach(message => {
+              let data = '';
+              message.split('\n').forEach(line => {
+                if (line.startsWith('id: ')) lastEventId = line.slice(4);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+              });
+              if (data) applyOrderEvent(JSON.parse(data));
+            });
+          }
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.error('Order feed disconnected:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, 2000));
+      }
+    };
+
+    listen();
+    return () => controller.abort();
+  }, []);
+
   const fetchProducts = async () => {
     try {
-      const response = await axios.get(`${API}/products`);
-      setProducts(response.data);
+      // The admin list shows the whole catalog, so walk every page
+      let allProducts = [];
+      let cursor;
+      do {
+        const response = await axios.get(`${API}/products`, { params: { cursor, limit: 200 } });
+        allProducts = allProducts.concat(response.data.products);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      setProducts(allProducts);
     } catch (error) {
       console.error('Error fetching products:', error);
       toast.error('Failed to load products');
     }
   };
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (cursor = null) => {
     try {
       const token = localStorage.getItem('token');
       const response = await axios.get(`${API}/admin/orders`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: { cursor: cursor || undefined }
       });
-      setOrders(response.data);
+      setOrders(cursor ? [...orders, ...response.data.orders] : response.data.orders);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching orders:', error);
       toast.error('Failed to load orders');
@@ -72,11 +140,20 @@ const AdminPanel = () => {
 
     try {
       if (editingProduct) {
+        // Stock moves with checkouts, so send only the admin's change as a delta
+        const { stock, ...details } = productData;
         await axios.put(
           `${API}/admin/products/${editingProduct.id}`,
-          productData,
+          details,
           { headers: { Authorization: `Bearer ${token}` } }
         );
+        if (stock !== editingProduct.stock) {
+          await axios.post(
+            `${API}/admin/products/${editingProduct.id}/stock`,
+            { delta: stock - editingProduct.stock },
+            { headers: { Authorization: `Bearer ${token}` } }
+          );
+        }
         toast.success('Product updated successfully');
       } else {
         await axios.post(
@@ -119,6 +196,31 @@ const AdminPanel = () => {
     setShowProductModal(true);
   };
 
+  const handleImageUpload = async (e) => {
+    const file = e.target.files[0];
+    if (!file || !editingProduct) return;
+
+    const formData = new FormData();
+    formData.append('image', file);
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.post(
+        `${API}/admin/products/${editingProduct.id}/image`,
+        formData,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      setEditingProduct(response.data);
+      setProductForm({ ...productForm, image_url: response.data.image_url });
+      toast.success('Image uploaded');
+      fetchProducts();
+    } catch (error) {
+      console.error('Error uploading image:', error);
+      toast.error(error.response?.data?.detail || 'Failed to upload image');
+    } finally {
+      e.target.value = '';
+    }
+  };
+
   const handleDeleteProduct = async (productId) => {
     if (!window.confirm('Are you sure you want to delete this product?')) return;
 
@@ -144,13 +246,30 @@ const AdminPanel = () => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
       toast.success('Order status updated');
-      fetchOrders();
+      setOrders(current => current.map(order => order.id === orderId ? { ...order, status: newStatus } : order));
     } catch (error) {
       console.error('Error updating order status:', error);
       toast.error('Failed to update order status');
     }
   };
 
+  const handleShipAllPending = async () => {
+    if (!window.confirm('Mark every Pending order as Shipped?')) return;
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.post(
+        `${API}/admin/orders/status`,
+        { status: 'Shipped', filter: { status: 'Pending' } },
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      toast.success(`${response.data.updated} orders marked Shipped`);
+      fetchOrders();
+    } catch (error) {
+      console.error('Error updating order statuses:', error);
+      toast.error('Failed to update order statuses');
+    }
+  };
+
   const getStatusColor = (status) => {
     switch (status) {
       case 'Pending': return '#f59e0b';
@@ -251,7 +370,9 @@ const AdminPanel = () => {
                     }}
                   >
                     <img
-                      src={product.image_url}
+                      src={imageUrl(product.image_url)}
+                      srcSet={imageSrcSet(product.srcset)}
+                      sizes="100px"
                       alt={product.title}
                       style={{ width: '100px', height: '140px', objectFit: 'cover', borderRadius: '8px' }}
                     />
@@ -314,6 +435,26 @@ const AdminPanel = () => {
           {/* Orders Management */}
           {activeTab === 'orders' && (
             <div>
+              {orders.some(order => order.status === 'Pending') && (
+                <div style={{ textAlign: 'right', marginBottom: '1.5rem' }}>
+                  <button
+                    onClick={handleShipAllPending}
+                    data-testid="ship-all-pending"
+                    style={{
+                      background: '#8B1538',
+                      color: 'white',
+                      border: 'none',
+                      padding: '0.75rem 2rem',
+                      borderRadius: '50px',
+                      fontSize: '1rem',
+                      fontWeight: '600',
+                      cursor: 'pointer'
+                    }}
+                  >
+                    Ship All Pending Orders
+                  </button>
+                </div>
+              )}
               {orders.length === 0 ? (
                 <div style={{ textAlign: 'center', padding: '4rem' }}>
                   <Package size={64} color="#999" style={{ marginBottom: '1rem' }} />
@@ -381,6 +522,26 @@ const AdminPanel = () => {
                       </div>
                     </div>
                   ))}
+                  {nextCursor && (
+                    <div style={{ textAlign: 'center', marginTop: '2rem' }}>
+                      <button
+                        onClick={() => fetchOrders(nextCursor)}
+                        data-testid="load-more-orders"
+                        style={{
+                          background: 'white',
+                          color: '#8B1538',
+                          border: '2px solid #8B1538',
+                          padding: '0.75rem 2rem',
+                          borderRadius: '50px',
+                          fontSize: '1rem',
+                          fontWeight: '600',
+                          cursor: 'pointer'
+                        }}
+                      >
+                        Load More
+                      </button>
+                    </div>
+                  )}
                 </div>
               )}
             </div>
@@ -482,13 +643,22 @@ const AdminPanel = () => {
                 <div>
                   <label style={{ display: 'block', marginBottom: '0.5rem', fontWeight: '600', color: '#8B1538' }}>Image URL</label>
                   <input
-                    type="url"
+                    type="text"
                     name="image_url"
                     value={productForm.image_url}
                     onChange={handleProductFormChange}
                     data-testid="product-image-url-input"
                     style={{ width: '100%', padding: '0.75rem', border: '2px solid #ddd', borderRadius: '8px', fontSize: '1rem' }}
                   />
+                  {editingProduct && (
+                    <input
+                      type="file"
+                      accept="image/*"
+                      onChange={handleImageUpload}
+                      data-testid="product-image-upload-input"
+                      style={{ marginTop: '0.5rem' }}
+                    />
+                  )}
                 </div>
 
                 <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr', gap: '1rem' }}>
@@ -6,6 +6,7 @@ import Footer from '@/components/Footer';
 import { AuthContext } from '@/App';
 import { toast } from 'sonner';
 import { Trash2, Plus, Minus } from 'lucide-react';
+import { imageUrl, imageSrcSet } from '@/lib/utils';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -131,7 +132,9 @@ const Cart = () => {
                     }}
                   >
                     <img
-                      src={item.product.image_url}
+                      src={imageUrl(item.product.image_url)}
+                      srcSet={imageSrcSet(item.product.srcset)}
+                      sizes="120px"
                       alt={item.product.title}
                       data-testid="cart-item-image"
                       style={{ width: '120px', height: '160px', objectFit: 'cover', borderRadius: '8px' }}
@@ -14,6 +14,8 @@ const Checkout = () => {
   const [cart, setCart] = useState([]);
   const [step, setStep] = useState(1); // 1: Shipping, 2: Payment, 3: Confirmation
   const [loading, setLoading] = useState(false);
+  // One key per checkout visit, so a retried "Place Order" can't create a second order
+  const [idempotencyKey] = useState(() => crypto.randomUUID());
   const [shippingAddress, setShippingAddress] = useState({
     full_name: '',
     address: '',
@@ -68,14 +70,19 @@ const Checkout = () => {
       await axios.post(
         `${API}/orders`,
         { shipping_address: shippingAddress },
-        { headers: { Authorization: `Bearer ${token}` } }
+        { headers: { Authorization: `Bearer ${token}`, 'Idempotency-Key': idempotencyKey } }
       );
       toast.success('Order placed successfully!');
       fetchCartCount();
       setStep(3);
     } catch (error) {
       console.error('Error placing order:', error);
-      toast.error('Failed to place order');
+      const outOfStock = error.response?.data?.detail?.out_of_stock;
+      if (outOfStock) {
+        toast.error(`Out of stock: ${outOfStock.map(line => `${line.title} (${line.available} left)`).join(', ')}`);
+      } else {
+        toast.error('Failed to place order');
+      }
     } finally {
       setLoading(false);
     }
@@ -4,6 +4,7 @@ import axios from 'axios';
 import Navbar from '@/components/Navbar';
 import Footer from '@/components/Footer';
 import { BookOpen } from 'lucide-react';
+import { imageUrl, imageSrcSet } from '@/lib/utils';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -17,8 +18,10 @@ const Home = () => {
 
   const fetchFeaturedProducts = async () => {
     try {
-      const response = await axios.get(`${API}/products`);
-      setFeaturedProducts(response.data.slice(0, 3));
+      const response = await axios.get(`${API}/products`, {
+        params: { limit: 3, fields: 'title,original_price,sale_price,image_url,srcset,category' }
+      });
+      setFeaturedProducts(response.data.products);
     } catch (error) {
       console.error('Error fetching products:', error);
     }
@@ -52,7 +55,9 @@ const Home = () => {
           {featuredProducts.map(product => (
             <div key={product.id} className="product-card" data-testid={`featured-product-${product.id}`}>
               <img 
-                src={product.image_url} 
+                src={imageUrl(product.image_url)}
+                srcSet={imageSrcSet(product.srcset)}
+                sizes="(max-width: 600px) 100vw, 320px"
                 alt={product.title} 
                 className="product-image"
                 data-testid="product-image"
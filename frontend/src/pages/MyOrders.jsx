@@ -11,18 +11,21 @@ const API = `${BACKEND_URL}/api`;
 const MyOrders = () => {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
     fetchOrders();
   }, []);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (cursor = null) => {
     try {
       const token = localStorage.getItem('token');
       const response = await axios.get(`${API}/orders`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: { cursor: cursor || undefined }
       });
-      setOrders(response.data);
+      setOrders(cursor ? [...orders, ...response.data.orders] : response.data.orders);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching orders:', error);
       toast.error('Failed to load orders');
@@ -126,6 +129,26 @@ const MyOrders = () => {
                 </div>
               </div>
             ))}
+            {nextCursor && (
+              <div style={{ textAlign: 'center', marginTop: '2rem' }}>
+                <button
+                  onClick={() => fetchOrders(nextCursor)}
+                  data-testid="load-more-orders"
+                  style={{
+                    background: 'white',
+                    color: '#8B1538',
+                    border: '2px solid #8B1538',
+                    padding: '0.75rem 2rem',
+                    borderRadius: '50px',
+                    fontSize: '1rem',
+                    fontWeight: '600',
+                    cursor: 'pointer'
+                  }}
+                >
+                  Load More
+                </button>
+              </div>
+            )}
           </div>
         )}
       </section>
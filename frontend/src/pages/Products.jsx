@@ -4,29 +4,57 @@ import Navbar from '@/components/Navbar';
 import Footer from '@/components/Footer';
 import { AuthContext } from '@/App';
 import { toast } from 'sonner';
+import { imageUrl, imageSrcSet } from '@/lib/utils';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const PAGE_SIZE = 24;
 
 const Products = () => {
   const [products, setProducts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [filter, setFilter] = useState('All');
+  const [query, setQuery] = useState('');
   const { fetchCartCount } = useContext(AuthContext);
 
   useEffect(() => {
-    fetchProducts();
-  }, []);
+    if (!query.trim()) {
+      fetchProducts();
+      return;
+    }
+    const timer = setTimeout(() => searchProducts(query), 200);
+    return () => clearTimeout(timer);
+  }, [filter, query]);
 
-  const fetchProducts = async () => {
+  const fetchProducts = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API}/products`);
-      setProducts(response.data);
+      const response = await axios.get(`${API}/products`, {
+        params: {
+          category: filter === 'All' ? undefined : filter,
+          cursor: cursor || undefined,
+          limit: PAGE_SIZE,
+          view: 'card'
+        }
+      });
+      setProducts(cursor ? [...products, ...response.data.products] : response.data.products);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching products:', error);
       toast.error('Failed to load products');
     }
   };
 
+  const searchProducts = async (q) => {
+    try {
+      const response = await axios.get(`${API}/products/search`, { params: { q, limit: 48 } });
+      const results = response.data.products;
+      setProducts(filter === 'All' ? results : results.filter(p => p.category === filter));
+      setNextCursor(null);
+    } catch (error) {
+      console.error('Error searching products:', error);
+    }
+  };
+
   const handleAddToCart = async (productId) => {
     const token = localStorage.getItem('token');
     if (!token) {
@@ -48,10 +76,6 @@ const Products = () => {
     }
   };
 
-  const filteredProducts = filter === 'All' 
-    ? products 
-    : products.filter(p => p.category === filter);
-
   return (
     <div>
       <Navbar />
@@ -59,6 +83,25 @@ const Products = () => {
       <section className="section" data-testid="products-section">
         <h1 className="section-title" data-testid="products-title">Our Publications</h1>
         
+        {/* Search */}
+        <div style={{ textAlign: 'center', marginBottom: '1.5rem' }}>
+          <input
+            type="search"
+            value={query}
+            onChange={(e) => setQuery(e.target.value)}
+            placeholder="Search publications..."
+            data-testid="product-search-input"
+            style={{
+              width: '100%',
+              maxWidth: '500px',
+              padding: '0.75rem 1.25rem',
+              border: '2px solid #8B1538',
+              borderRadius: '50px',
+              fontSize: '1rem'
+            }}
+          />
+        </div>
+
         {/* Filter Buttons */}
         <div style={{ textAlign: 'center', marginBottom: '2rem' }}>
           {['All', 'Book', 'Magazine', 'Novel'].map(category => (
@@ -86,10 +129,12 @@ const Products = () => {
 
         {/* Products Grid */}
         <div className="products-grid">
-          {filteredProducts.map(product => (
+          {products.map(product => (
             <div key={product.id} className="product-card" data-testid={`product-card-${product.id}`}>
               <img 
-                src={product.image_url} 
+                src={imageUrl(product.image_url)}
+                srcSet={imageSrcSet(product.srcset)}
+                sizes="(max-width: 600px) 100vw, 320px"
                 alt={product.title} 
                 className="product-image"
                 data-testid="product-image"
@@ -122,9 +167,22 @@ const Products = () => {
           ))}
         </div>
 
-        {filteredProducts.length === 0 && (
+        {products.length === 0 && (
           <p style={{ textAlign: 'center', fontSize: '1.2rem', color: '#666' }}>No products found in this category.</p>
         )}
+
+        {nextCursor && (
+          <div style={{ textAlign: 'center', marginTop: '2rem' }}>
+            <button
+              className="add-to-cart-btn"
+              onClick={() => fetchProducts(nextCursor)}
+              data-testid="load-more-products"
+              style={{ width: 'auto', padding: '0.75rem 2rem' }}
+            >
+              Load More
+            </button>
+          </div>
+        )}
       </section>
 
       <Footer />
@@ -0,0 +1,35 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017")
+# Point the app at the local test server instead of the deployment in backend/.env.
+os.environ["MONGO_URL"] = TEST_MONGO_URL
+os.environ["DB_NAME"] = "anukriti_test"
+
+
+@pytest.fixture(scope="session")
+def mongo_client():
+    client = MongoClient(TEST_MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"no mongod reachable at {TEST_MONGO_URL}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def mongo_db(mongo_client):
+    """A throwaway database on the local mongod; skips when none is running."""
+    name = f"anukriti_test_{uuid.uuid4().hex[:8]}"
+    yield mongo_client[name]
+    mongo_client.drop_database(name)
@@ -0,0 +1,113 @@
+"""Incremental sales rollups kept in step with order writes."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+def order(order_id, status="Pending", day="2025-01-02", lines=(("p1", "Book", 2, 10.0),)):
+    products = [
+        {"product_id": product_id, "title": f"Title {product_id}", "category": category,
+         "quantity": quantity, "price": price}
+        for product_id, category, quantity, price in lines
+    ]
+    return {
+        "id": order_id,
+        "status": status,
+        "order_date": f"{day}T10:00:00+00:00",
+        "products": products,
+        "total_amount": sum(line["quantity"] * line["price"] for line in products),
+    }
+
+
+@pytest.fixture
+def rollups():
+    collection = mongomock.MongoClient().db.sales_rollups
+
+    def apply(updates):
+        if updates:
+            collection.bulk_write(updates)
+        return {document["_id"]: document for document in collection.find()}
+
+    return apply
+
+
+def test_new_orders_add_to_every_rollup(rollups):
+    rollups(server.order_created_rollups(order("o1")))
+    docs = rollups(server.order_created_rollups(order("o2", lines=(("p1", "Book", 1, 10.0), ("p2", "Novel", 3, 5.0)))))
+    assert docs["day:2025-01-02"]["revenue"] == 45.0
+    assert docs["day:2025-01-02"]["orders"] == 2
+    assert docs["day:2025-01-02"]["units"] == 6
+    assert docs["product:p1"]["units"] == 3
+    assert docs["product:p2"]["revenue"] == 15.0
+    assert docs["status:Pending"]["orders"] == 2
+    assert all("created_at" in document for document in docs.values())
+
+
+def test_category_counts_an_order_once(rollups):
+    lines = (("p1", "Book", 1, 10.0), ("p2", "Book", 2, 5.0))
+    docs = rollups(server.order_created_rollups(order("o1", lines=lines)))
+    assert docs["category:Book"]["orders"] == 1
+    assert docs["category:Book"]["units"] == 3
+    assert docs["category:Book"]["revenue"] == 20.0
+
+
+def test_cancelling_removes_sales_and_moves_the_status_count(rollups):
+    placed = [order("o1"), order("o2", status="Shipped")]
+    for placed_order in placed:
+        rollups(server.order_created_rollups(placed_order))
+    docs = rollups(server.status_change_rollups(placed, "Cancelled"))
+    assert docs["day:2025-01-02"]["revenue"] == 0
+    assert docs["day:2025-01-02"]["orders"] == 0
+    assert docs["product:p1"]["units"] == 0
+    assert docs["category:Book"]["orders"] == 0
+    assert docs["status:Pending"]["orders"] == 0
+    assert docs["status:Shipped"]["orders"] == 0
+    assert docs["status:Cancelled"]["orders"] == 2
+
+
+def test_leaving_cancelled_restores_sales(rollups):
+    cancelled = order("o1")
+    rollups(server.order_created_rollups(cancelled))
+    rollups(server.status_change_rollups([cancelled], "Cancelled"))
+    cancelled["status"] = "Cancelled"
+    docs = rollups(server.status_change_rollups([cancelled], "Pending"))
+    assert docs["day:2025-01-02"]["revenue"] == 20.0
+    assert docs["product:p1"]["units"] == 2
+    assert docs["status:Cancelled"]["orders"] == 0
+    assert docs["status:Pending"]["orders"] == 1
+
+
+def test_moves_between_open_statuses_leave_sales_alone(rollups):
+    placed = order("o1")
+    rollups(server.order_created_rollups(placed))
+    docs = rollups(server.status_change_rollups([placed], "Shipped"))
+    assert docs["day:2025-01-02"]["revenue"] == 20.0
+    assert docs["product:p1"]["units"] == 2
+    assert docs["status:Pending"]["orders"] == 0
+    assert docs["status:Shipped"]["orders"] == 1
+    assert server.status_change_rollups([order("o2", status="Shipped")], "Shipped") == []
+
+
+def test_rebuild_keeps_rollups_created_while_it_ran(monkeypatch):
+    database = AsyncMongoMockClient()["anukriti_test"]
+    monkeypatch.setattr(server, "db", database)
+    # The pipelines produce nothing here, so every document is a deletion candidate
+    monkeypatch.setattr(server, "rollup_pipelines", lambda rebuild: [])
+    now = datetime.now(timezone.utc)
+
+    async def run():
+        await database.sales_rollups.insert_many([
+            {"_id": "day:2025-01-01", "kind": "day", "rebuild": "older"},
+            {"_id": "day:2025-01-02", "kind": "day", "created_at": now - timedelta(hours=1)},
+            # Upserted by an order placed after the rebuild started
+            {"_id": "day:2025-01-03", "kind": "day", "created_at": now + timedelta(hours=1)},
+        ])
+        await server.rebuild_analytics(admin={})
+        return [document["_id"] async for document in database.sales_rollups.find()]
+
+    assert asyncio.run(run()) == ["day:2025-01-03"]
@@ -0,0 +1,47 @@
+"""The app can be started, stopped and started again in one process."""
+import asyncio
+import io
+
+from mongomock_motor import AsyncMongoMockClient
+from PIL import Image
+
+import server
+
+
+def restart_twice(monkeypatch, work):
+    monkeypatch.setattr(server, "MONGO_WARMUP", False)
+    monkeypatch.setattr(server, "ORDER_ARCHIVE_ENABLED", False)
+
+    async def scenario():
+        results = []
+        for _ in range(2):
+            # The lifespan keeps a client that is already installed
+            monkeypatch.setattr(server, "client", AsyncMongoMockClient())
+            monkeypatch.setattr(server, "db", server.client["anukriti_test"])
+            async with server.lifespan(server.app):
+                results.append(await work())
+        return results
+
+    return asyncio.run(scenario())
+
+
+def test_password_hashing_survives_a_restart(monkeypatch):
+    async def work():
+        hashed = await server.hash_password("secret")
+        return await server.verify_password("secret", hashed)
+
+    assert restart_twice(monkeypatch, work) == [True, True]
+
+
+def test_image_resizing_survives_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "IMAGE_DIR", tmp_path)
+    monkeypatch.setattr(server, "IMAGE_WIDTHS", [320])
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), "white").save(buffer, "PNG")
+
+    async def work():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(server.image_pool(), server.render_image_variants, buffer.getvalue())
+
+    first, second = restart_twice(monkeypatch, work)
+    assert list(first) == ["320w"] and second == first
@@ -0,0 +1,60 @@
+"""Parallel cart writes must never lose an update."""
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+from tests.conftest import TEST_MONGO_URL
+
+
+def run_against(mongo_db, monkeypatch, coro_factory):
+    async def run():
+        client = AsyncIOMotorClient(TEST_MONGO_URL)
+        monkeypatch.setattr(server, "db", client[mongo_db.name])
+        try:
+            await coro_factory()
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+
+def seed(mongo_db, product_ids):
+    mongo_db.users.insert_one({"id": "u1", "role": "user", "cart": []})
+    mongo_db.products.insert_many([{"id": product_id, "title": product_id} for product_id in product_ids])
+
+
+def test_parallel_adds_of_one_product(mongo_db, monkeypatch):
+    seed(mongo_db, ["p1"])
+    user = {"id": "u1", "role": "user"}
+
+    async def adds():
+        await asyncio.gather(*(
+            server.add_cart_item(server.AddToCart(product_id="p1", quantity=1), user) for _ in range(100)
+        ))
+
+    run_against(mongo_db, monkeypatch, adds)
+    assert mongo_db.users.find_one({"id": "u1"})["cart"] == [{"product_id": "p1", "quantity": 100}]
+
+
+def test_parallel_adds_and_removes_across_products(mongo_db, monkeypatch):
+    product_ids = [f"p{i}" for i in range(5)]
+    seed(mongo_db, product_ids + ["gone"])
+    user = {"id": "u1", "role": "user"}
+
+    async def writes():
+        await server.add_cart_item(server.AddToCart(product_id="gone", quantity=3), user)
+        await asyncio.gather(
+            *(
+                server.add_cart_item(server.AddToCart(product_id=product_id, quantity=2), user)
+                for product_id in product_ids
+                for _ in range(20)
+            ),
+            server.remove_from_cart("gone", user=user),
+        )
+
+    run_against(mongo_db, monkeypatch, writes)
+    cart = mongo_db.users.find_one({"id": "u1"})["cart"]
+    assert sorted((item["product_id"], item["quantity"]) for item in cart) == [
+        (product_id, 40) for product_id in product_ids
+    ]
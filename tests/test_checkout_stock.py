@@ -0,0 +1,111 @@
+"""Checkout stock reservations must never oversell or strand stock."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+from tests.conftest import TEST_MONGO_URL
+
+
+@pytest.fixture(params=["mongomock", "mongod"])
+def connect(request, monkeypatch):
+    """Runs each test on mongomock, and again on a local mongod when one is up."""
+    monkeypatch.setattr(server, "catalog_cache", server.CatalogCache(300, 1024 * 1024))
+    if request.param == "mongomock":
+        return lambda: AsyncMongoMockClient()
+    mongo_db = request.getfixturevalue("mongo_db")
+    monkeypatch.setenv("DB_NAME", mongo_db.name)
+    return lambda: AsyncIOMotorClient(TEST_MONGO_URL)
+
+
+def run(connect, monkeypatch, scenario):
+    async def main():
+        client = connect()
+        database = client[server.os.environ["DB_NAME"]]
+        monkeypatch.setattr(server, "db", database)
+        try:
+            return await scenario(database)
+        finally:
+            client.close()
+
+    return asyncio.run(main())
+
+
+def line(product_id, quantity):
+    return {"product_id": product_id, "title": product_id.upper(), "quantity": quantity, "price": 10.0}
+
+
+async def stock_of(database):
+    return {product["id"]: (product["stock"], product.get("reservations", [])) async for product in database.products.find()}
+
+
+def test_concurrent_checkouts_never_oversell(connect, monkeypatch):
+    async def scenario(database):
+        await database.products.insert_one({"id": "p1", "title": "P1", "stock": 5})
+        results = await asyncio.gather(
+            *(server.reserve_stock(f"o{n}", [line("p1", 1)]) for n in range(20)),
+            return_exceptions=True,
+        )
+        return results, await stock_of(database)
+
+    results, stock = run(connect, monkeypatch, scenario)
+    assert sum(result is None for result in results) == 5
+    assert all(result.status_code == 409 for result in results if result is not None)
+    remaining, tags = stock["p1"]
+    assert remaining == 0
+    assert len(tags) == 5
+
+
+def test_short_line_gives_back_only_the_decrements_that_landed(connect, monkeypatch):
+    async def scenario(database):
+        await database.products.insert_many([
+            {"id": "p1", "title": "P1", "stock": 10},
+            {"id": "p2", "title": "P2", "stock": 1},
+            {"id": "p3", "title": "P3", "stock": 4},
+        ])
+        with pytest.raises(HTTPException) as caught:
+            await server.reserve_stock("o1", [line("p1", 2), line("p2", 3), line("p3", 4)])
+        return caught.value, await stock_of(database)
+
+    error, stock = run(connect, monkeypatch, scenario)
+    assert stock == {"p1": (10, []), "p2": (1, []), "p3": (4, [])}
+    assert error.status_code == 409
+    assert error.detail["out_of_stock"] == [{"product_id": "p2", "title": "P2", "requested": 3, "available": 1}]
+
+
+def test_reserve_drops_cached_product_bodies(connect, monkeypatch):
+    async def scenario(database):
+        await database.products.insert_one({"id": "p1", "title": "P1", "stock": 5})
+        server.catalog_cache.put("product:p1", b'{"stock":5}', server.catalog_cache.version)
+        await server.reserve_stock("o1", [line("p1", 2)])
+
+    run(connect, monkeypatch, scenario)
+    assert server.catalog_cache.get("product:p1") is None
+
+
+def test_abandoned_reservations_are_released(connect, monkeypatch):
+    old = datetime.now(timezone.utc) - timedelta(seconds=server.STOCK_RESERVATION_TIMEOUT_SECONDS + 60)
+
+    def tag(order_id, quantity, reserved_at):
+        return {"order_id": order_id, "quantity": quantity, "reserved_at": reserved_at}
+
+    async def scenario(database):
+        await database.products.insert_one({"id": "p1", "title": "P1", "stock": 4, "reservations": [
+            tag("crashed", 2, old),
+            tag("stored", 1, old),
+            tag("in-flight", 3, datetime.now(timezone.utc)),
+            "legacy",
+        ]})
+        await database.orders.insert_one({"id": "stored"})
+        released = await server.release_abandoned_reservations()
+        return released, await stock_of(database)
+
+    released, stock = run(connect, monkeypatch, scenario)
+    assert released == 1
+    remaining, tags = stock["p1"]
+    assert remaining == 6
+    assert [server.reservation_order(tag) for tag in tags] == ["in-flight", "legacy"]
@@ -0,0 +1,77 @@
+"""Response compression negotiation, thresholds and streaming."""
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import server
+
+BIG = "कहानियाँ और कविताएँ " * 200
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(server.CompressionMiddleware)
+
+    @app.get("/big")
+    def big():
+        return PlainTextResponse(BIG)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\0" * 4096, media_type="application/octet-stream")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"{i}\n".encode() * 500 for i in range(3)), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse((b"data: {}\n\n" * 500 for _ in range(3)), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_negotiate_encoding():
+    assert server.negotiate_encoding("gzip, deflate") == "gzip"
+    assert server.negotiate_encoding("gzip;q=1, br;q=0") == "gzip"
+    assert server.negotiate_encoding("identity") is None
+    assert server.negotiate_encoding("") is None
+    if server.brotli is not None:
+        assert server.negotiate_encoding("gzip, br") == "br"
+
+
+def test_compresses_allowlisted_bodies_over_threshold():
+    client = make_client()
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.text == BIG
+
+    for path in ("/small", "/binary", "/events"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+
+def test_streams_are_compressed_incrementally():
+    client = make_client()
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == "".join(f"{i}\n" * 500 for i in range(3)).encode()
+
+
+def test_catalog_cache_keeps_one_encoding_per_entry():
+    cache = server.CatalogCache(ttl_seconds=60, max_bytes=1 << 20)
+    body = BIG.encode()
+    cache.put("products?", body, cache.version)
+    encoded = cache.encoded("products?", body, "gzip")
+    assert gzip.decompress(encoded) == body
+    assert cache.encoded("products?", body, "gzip") is encoded
+    assert cache._size == len(body) + len(encoded)
+    assert cache.encoded("products?", b"other", "gzip") is None
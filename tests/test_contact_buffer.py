@@ -0,0 +1,62 @@
+"""Write-behind buffering of contact submissions."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+class FakeContacts:
+    def __init__(self):
+        self.batches = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def insert_many(self, documents, ordered=True):
+        await self.release.wait()
+        self.batches.append([document["id"] for document in documents])
+
+
+@pytest.fixture
+def contacts(monkeypatch):
+    monkeypatch.setattr(server, "CONTACT_BATCH_SIZE", 3)
+    monkeypatch.setattr(server, "CONTACT_FLUSH_INTERVAL_SECONDS", 60)
+    monkeypatch.setattr(server, "CONTACT_QUEUE_MAX", 2)
+    monkeypatch.setattr(server, "CONTACT_ENQUEUE_TIMEOUT_SECONDS", 0.01)
+    fake = FakeContacts()
+    monkeypatch.setattr(server, "db", SimpleNamespace(contacts=fake))
+    return fake
+
+
+def test_flushes_full_batches_and_the_rest_on_close(contacts):
+    async def scenario():
+        buffer = server.ContactWriteBuffer()
+        buffer.start()
+        for n in range(4):
+            await buffer.submit({"id": f"c{n}"})
+        await asyncio.sleep(0.01)
+        assert contacts.batches == [["c0", "c1", "c2"]]
+        await buffer.close()
+
+    asyncio.run(scenario())
+    assert contacts.batches == [["c0", "c1", "c2"], ["c3"]]
+
+
+def test_full_queue_pushes_back(contacts):
+    async def scenario():
+        contacts.release.clear()  # the database stalls
+        buffer = server.ContactWriteBuffer()
+        buffer.start()
+        for n in range(5):  # three in the stalled batch, two queued
+            await buffer.submit({"id": f"c{n}"})
+            await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await buffer.submit({"id": "c5"})
+        assert error.value.status_code == 503
+        contacts.release.set()
+        await buffer.close()
+
+    asyncio.run(scenario())
+    assert sorted(sum(contacts.batches, [])) == [f"c{n}" for n in range(5)]
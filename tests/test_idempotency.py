@@ -0,0 +1,151 @@
+"""Idempotency-Key handling for cart and order writes."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect
+
+import server
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    database = AsyncMongoMockClient()["anukriti_test"]
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "idempotency_cache", server.TTLCache(60, 100))
+    monkeypatch.setattr(server, "IDEMPOTENCY_POLL_SECONDS", 0.001)
+    return database.idempotency_keys
+
+
+class Handler:
+    def __init__(self, result=None, error=None, delay=0):
+        self.calls = 0
+        self.result = result if result is not None else {"id": "order-1"}
+        self.error = error
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run(key, payload, handler):
+    return server.run_idempotent(key, "user-1", "orders", payload, handler)
+
+
+def test_replay_returns_the_stored_response(keys):
+    handler = Handler()
+
+    async def scenario():
+        assert await run("k1", {"n": 1}, handler) == {"id": "order-1"}
+        # A fresh worker has nothing cached and reads the record from Mongo
+        server.idempotency_cache = server.TTLCache(60, 100)
+        return await run("k1", {"n": 1}, handler)
+
+    replay = asyncio.run(scenario())
+    assert handler.calls == 1
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.body == b'{"id":"order-1"}'
+
+
+def test_client_errors_are_replayed(keys):
+    handler = Handler(error=HTTPException(status_code=400, detail="Cart is empty"))
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await run("k1", {"n": 1}, handler)
+        return await run("k1", {"n": 1}, handler)
+
+    replay = asyncio.run(scenario())
+    assert handler.calls == 1
+    assert replay.status_code == 400
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+def test_reused_key_with_a_different_body_is_rejected(keys):
+    async def scenario():
+        await run("k1", {"n": 1}, Handler())
+        await run("k1", {"n": 2}, Handler())
+
+    with pytest.raises(HTTPException) as caught:
+        asyncio.run(scenario())
+    assert caught.value.status_code == 422
+
+
+def test_concurrent_duplicates_run_the_handler_once(keys):
+    handler = Handler(delay=0.02)
+
+    async def scenario():
+        return await asyncio.gather(*(run("k1", {"n": 1}, handler) for _ in range(3)))
+
+    first, *repeats = asyncio.run(scenario())
+    assert handler.calls == 1
+    assert first == {"id": "order-1"}
+    assert all(repeat.headers["Idempotent-Replayed"] == "true" for repeat in repeats)
+
+
+def test_duplicate_on_another_worker_waits_for_the_stored_response(keys):
+    async def scenario():
+        assert await server.claim_idempotency_key("u:orders:k1", "fp") is None
+        waiting = asyncio.create_task(server.claim_idempotency_key("u:orders:k1", "fp"))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        await server.store_idempotent("u:orders:k1", "fp", 200, {"id": "order-1"})
+        return await waiting
+
+    record = asyncio.run(scenario())
+    assert record["status"] == "completed"
+    assert record["body"] == {"id": "order-1"}
+
+
+def test_server_error_releases_the_key(keys):
+    failing = Handler(error=HTTPException(status_code=503, detail="Try again"))
+    retry = Handler()
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await run("k1", {"n": 1}, failing)
+        assert await keys.count_documents({}) == 0
+        return await run("k1", {"n": 1}, retry)
+
+    assert asyncio.run(scenario()) == {"id": "order-1"}
+    assert retry.calls == 1
+
+
+def test_expired_lease_is_taken_over(keys):
+    async def scenario():
+        await keys.insert_one({
+            "_id": "u:orders:k1",
+            "fingerprint": "old",
+            "status": "in_progress",
+            "created_at": datetime.now(timezone.utc),
+            "leased_until": datetime.now(timezone.utc) - timedelta(seconds=1),
+        })
+        assert await server.claim_idempotency_key("u:orders:k1", "new") is None
+        return await keys.find_one({"_id": "u:orders:k1"})
+
+    record = asyncio.run(scenario())
+    assert record["fingerprint"] == "new"
+    assert record["status"] == "in_progress"
+
+
+def test_failed_store_releases_the_key_and_keeps_the_result(keys, monkeypatch):
+    async def unreachable(*args, **kwargs):
+        raise AutoReconnect("connection reset")
+
+    monkeypatch.setattr(type(keys), "update_one", unreachable)
+    handler = Handler()
+
+    async def scenario():
+        assert await run("k1", {"n": 1}, handler) == {"id": "order-1"}
+        return await keys.count_documents({})
+
+    # The order went through: the caller gets it, and the key isn't left in progress
+    assert asyncio.run(scenario()) == 0
+    assert handler.calls == 1
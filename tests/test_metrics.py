@@ -0,0 +1,53 @@
+"""Prometheus metrics: route instrumentation and the pymongo listeners."""
+from types import SimpleNamespace
+
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import server
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_routes_are_timed_under_their_template():
+    router = APIRouter(route_class=server.InstrumentedRoute)
+
+    @router.get("/things/{thing_id}")
+    def get_thing(thing_id: str):
+        if thing_id == "missing":
+            raise HTTPException(status_code=404)
+        return {"id": thing_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    labels = {"method": "GET", "route": "/things/{thing_id}"}
+    before = sample("http_request_duration_seconds_count", **labels)
+
+    client.get("/things/a")
+    client.get("/things/missing")
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+    assert sample("http_requests_total", status="404", **labels) >= 1
+    assert sample("http_requests_in_flight", **labels) == 0
+
+
+def test_command_listener_labels_by_collection():
+    listener = server.MongoCommandMetrics()
+    labels = {"collection": "products", "command": "find"}
+    before = sample("mongodb_command_duration_seconds_count", **labels)
+
+    listener.started(SimpleNamespace(command={"find": "products"}, command_name="find", connection_id=1, request_id=7))
+    listener.succeeded(SimpleNamespace(command_name="find", connection_id=1, request_id=7, duration_micros=1500))
+
+    assert sample("mongodb_command_duration_seconds_count", **labels) == before + 1
+    assert listener._collections == {}
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    response = TestClient(server.app).get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_request_duration_seconds" in response.text
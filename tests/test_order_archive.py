@@ -0,0 +1,58 @@
+"""Archiving finished orders must not change what order history returns."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+from tests.conftest import TEST_MONGO_URL
+
+
+def test_history_pages_through_hot_and_archived_orders(mongo_db, monkeypatch):
+    now = datetime.now(timezone.utc)
+    statuses = ["Delivered", "Cancelled", "Pending", "Shipped"]
+    mongo_db.orders.insert_many([
+        {
+            "id": f"o{i:02d}",
+            "user_id": "u1",
+            "status": statuses[i % 4],
+            "order_date": (now - timedelta(days=200 - 20 * i)).isoformat(),
+        }
+        for i in range(12)
+    ])
+    monkeypatch.setattr(server, "ORDER_ARCHIVE_AFTER_DAYS", 90)
+    monkeypatch.setattr(server, "ORDER_ARCHIVE_BATCH_SIZE", 3)
+
+    async def run():
+        client = AsyncIOMotorClient(TEST_MONGO_URL)
+        monkeypatch.setattr(server, "db", client[mongo_db.name])
+        try:
+            assert await server.archive_orders() == 4
+            # An order caught between copy and delete is listed once
+            mongo_db.orders.insert_one(mongo_db.orders_archive.find_one({"id": "o01"}))
+            projection = {"_id": 0, "id": 1, "order_date": 1}
+            return [order["id"] async for order in server.order_history(server.db, {"user_id": "u1"}, projection)]
+        finally:
+            client.close()
+
+    history = asyncio.run(run())
+    assert history == [f"o{i:02d}" for i in reversed(range(12))]
+    assert sorted(order["id"] for order in mongo_db.orders_archive.find()) == ["o00", "o01", "o04", "o05"]
+
+
+def test_bulk_status_reports_archived_orders(monkeypatch):
+    database = AsyncMongoMockClient()["anukriti_test"]
+    monkeypatch.setattr(server, "db", database)
+    order = {"user_id": "u1", "status": "Delivered", "order_date": "2025-01-02T10:00:00+00:00",
+             "products": [], "total_amount": 0.0}
+
+    async def run():
+        await database.orders.insert_one({"id": "hot", **order})
+        await database.orders_archive.insert_one({"id": "old", **order})
+        update = server.BulkOrderStatusUpdate(status="Cancelled", order_ids=["hot", "old", "missing"])
+        return await server.bulk_update_order_status(update, admin={})
+
+    result = asyncio.run(run())
+    assert result["results"] == {"hot": "updated", "old": "archived", "missing": "not_found"}
+    assert result["updated"] == 1
@@ -0,0 +1,84 @@
+"""Admin order feed: change events to deltas, and fan-out to subscribers."""
+import asyncio
+from types import SimpleNamespace
+
+import server
+
+
+def test_change_events_become_small_deltas():
+    insert = {"_id": {"_data": "82A1"}, "operationType": "insert", "fullDocument": {"id": "o1", "status": "Pending"}}
+    update = {
+        "_id": {"_data": "82A2"},
+        "operationType": "update",
+        "updateDescription": {"updatedFields": {"status": "Shipped"}},
+        "fullDocument": {"id": "o1"},
+    }
+    assert server.order_change_event(insert) == ("82A1", {"type": "order_created", "order": insert["fullDocument"]})
+    assert server.order_change_event(update) == ("82A2", {"type": "order_status", "id": "o1", "status": "Shipped"})
+
+
+def test_slow_subscriber_is_cut_off_and_told_to_resume(monkeypatch):
+    monkeypatch.setattr(server, "ORDER_FEED_QUEUE_SIZE", 2)
+
+    async def scenario():
+        feed = server.OrderFeed()
+        monkeypatch.setattr(feed, "_watch", lambda: asyncio.sleep(3600))
+        slow, fast = feed.subscribe(), feed.subscribe()
+        for n in range(3):
+            feed.publish(f"e{n}", {"n": n})
+            if n < 2:
+                fast.get_nowait()
+        assert slow.get_nowait() is None and slow.empty()
+        assert feed.subscribers == {fast}
+        assert fast.get_nowait() == ("e2", {"n": 2})
+        feed.unsubscribe(fast)
+
+    asyncio.run(scenario())
+
+
+class FakeChangeStream:
+    def __init__(self, changes):
+        self.changes = changes
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for change in self.changes:
+            yield change
+        await asyncio.sleep(3600)
+
+
+class FakeOrders:
+    def __init__(self, changes):
+        self.changes = changes
+        self.resumed_after = []
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        self.resumed_after.append(resume_after)
+        if resume_after is not None:
+            raise server.OperationFailure("Resume of change stream was not possible", code=286)
+        return FakeChangeStream(self.changes)
+
+
+def test_lost_resume_token_resets_clients_and_restarts_from_now(monkeypatch):
+    insert = {"_id": {"_data": "82B1"}, "operationType": "insert", "fullDocument": {"id": "o2"}}
+    orders = FakeOrders([insert])
+    monkeypatch.setattr(server, "db", SimpleNamespace(orders=orders))
+    monkeypatch.setattr(server, "ORDER_FEED_MODE", "changestream")
+
+    async def scenario():
+        feed = server.OrderFeed()
+        queue = feed.subscribe()
+        feed._resume_token = {"_data": "82A0"}
+        events = [await asyncio.wait_for(queue.get(), 1) for _ in range(2)]
+        feed.unsubscribe(queue)
+        return feed, events
+
+    feed, events = asyncio.run(scenario())
+    assert events == [(None, {"type": "reset"}), ("82B1", {"type": "order_created", "order": {"id": "o2"}})]
+    assert orders.resumed_after == [{"_data": "82A0"}, None]
+    assert feed._resume_token == {"_data": "82B1"}
@@ -0,0 +1,51 @@
+"""Keyset pagination cursors."""
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+import server
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    values = ["2025-01-03T10:00:00+00:00", "o2", 12.5, 3]
+    cursor = server.encode_cursor(values)
+    assert "=" not in cursor
+    assert server.decode_cursor(cursor) == values
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 json!",
+    raw_cursor({"order_date": "2025-01-03"}),
+    raw_cursor([]),
+    raw_cursor([{"$gt": ""}, "o2"]),
+    raw_cursor(["2025-01-03", ["o2"]]),
+    raw_cursor([None, "o2"]),
+    raw_cursor([True, "o2"]),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as caught:
+        server.decode_cursor(cursor)
+    assert caught.value.status_code == 400
+
+
+def test_keyset_filter_descending():
+    query = server.keyset_filter([("order_date", DESCENDING), ("id", DESCENDING)], ["2025-01-03", "o2"])
+    assert query == {"$or": [
+        {"order_date": {"$lt": "2025-01-03"}},
+        {"order_date": "2025-01-03", "id": {"$lt": "o2"}},
+    ]}
+
+
+def test_keyset_filter_ascending():
+    query = server.keyset_filter([("effective_price", ASCENDING), ("_id", ASCENDING)], [50.0, "abc"])
+    assert query == {"$or": [
+        {"effective_price": {"$gt": 50.0}},
+        {"effective_price": 50.0, "_id": {"$gt": "abc"}},
+    ]}
@@ -0,0 +1,31 @@
+"""Responsive product image variants and byte-range parsing."""
+import io
+
+from PIL import Image
+
+import server
+
+
+def test_parse_byte_range():
+    assert server.parse_byte_range("bytes=0-9", 100) == (0, 9)
+    assert server.parse_byte_range("bytes=90-", 100) == (90, 99)
+    assert server.parse_byte_range("bytes=-10", 100) == (90, 99)
+    assert server.parse_byte_range("bytes=50-500", 100) == (50, 99)
+    assert server.parse_byte_range("bytes=100-", 100) == ()
+    assert server.parse_byte_range("bytes=0-1,5-6", 100) is None
+    assert server.parse_byte_range("items=0-1", 100) is None
+
+
+def test_variants_are_content_hashed_and_never_upscaled(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "IMAGE_DIR", tmp_path)
+    monkeypatch.setattr(server, "IMAGE_WIDTHS", [320, 640, 1024])
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 1200), "white").save(buffer, "PNG")
+
+    srcset = server.render_image_variants(buffer.getvalue())
+
+    assert list(srcset) == ["320w", "640w", "800w"]
+    assert srcset == server.render_image_variants(buffer.getvalue())
+    for width, url in srcset.items():
+        with Image.open(tmp_path / url.rsplit("/", 1)[1]) as variant:
+            assert f"{variant.width}w" == width
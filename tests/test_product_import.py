@@ -0,0 +1,93 @@
+"""Streaming catalog import: row parsing and validation."""
+import asyncio
+
+import mongomock
+import pytest
+
+import server
+
+
+async def lines_of(text):
+    for line in text.splitlines(keepends=True):
+        yield line
+
+
+def parse(parser, text):
+    async def collect():
+        return [row async for row in parser(lines_of(text))]
+
+    return asyncio.run(collect())
+
+
+def test_csv_rows_keep_quoted_newlines_and_skip_blank_lines():
+    rows = parse(server.iter_csv_rows, 'Title,Description,original_price\r\n"a, b","line 1\nline ""2""",10\r\n\r\nc,d,\r\n')
+    assert rows == [
+        (1, {"title": "a, b", "description": 'line 1\nline "2"', "original_price": "10"}),
+        (2, {"title": "c", "description": "d"}),
+    ]
+
+
+def test_csv_reports_unterminated_quote():
+    (row_number, error), = parse(server.iter_csv_rows, 'title\n"open\n')
+    assert row_number == 1 and isinstance(error, ValueError)
+
+
+def test_csv_caps_runaway_records(monkeypatch):
+    monkeypatch.setattr(server, "PRODUCT_IMPORT_MAX_RECORD_CHARS", 20)
+    rows = parse(server.iter_csv_rows, 'title\n"open\nstill open\nand more\nnext\n')
+    assert [(number, str(error)) for number, error in rows[:1]] == [(1, "record longer than 20 characters")]
+    assert rows[1:] == [(2, {"title": "next"})]
+
+
+def test_ndjson_rows_flag_bad_lines():
+    rows = parse(server.iter_ndjson_rows, '{"title": "a"}\n\nnot json\n[1]\n')
+    assert rows[0] == (1, {"title": "a"})
+    assert [(number, str(error)) for number, error in rows[1:]] == [(2, "invalid JSON"), (3, "expected a JSON object")]
+
+
+def test_product_upsert_validates_and_keys_rows():
+    row = {"id": "p1", "title": "t", "description": "d", "original_price": "100", "sale_price": "80", "category": "Book"}
+    key_value, op = server.product_upsert(row, "id")
+    assert key_value == "p1"
+    products = mongomock.MongoClient().db.products
+    products.bulk_write([op])
+    product = products.find_one({"id": "p1"})
+    assert product["effective_price"] == 80.0
+    assert product["stock"] == 100
+
+    with pytest.raises(server.ValidationError):
+        server.product_upsert({"title": "t"}, "id")
+
+
+def test_product_upsert_keeps_columns_the_row_leaves_out():
+    products = mongomock.MongoClient().db.products
+    products.insert_one({
+        "id": "p1", "title": "t", "description": "d", "original_price": 100.0, "sale_price": 80.0,
+        "category": "Book", "stock": 7, "image_url": "/api/images/a-320w.webp",
+        "srcset": {"320w": "/api/images/a-320w.webp"},
+    })
+    row = {"id": "p1", "title": "t2", "description": "d", "original_price": "120", "category": "Book"}
+    products.bulk_write([server.product_upsert(row, "id")[1]])
+    product = products.find_one({"id": "p1"}, {"_id": 0})
+    assert (product["title"], product["stock"], product["sale_price"], product["effective_price"]) == ("t2", 7, 80.0, 80.0)
+    assert product["srcset"] == {"320w": "/api/images/a-320w.webp"}
+
+    products.bulk_write([server.product_upsert({**row, "image_url": "https://example.com/b.jpg"}, "id")[1]])
+    assert products.find_one({"id": "p1"})["srcset"] is None
+
+
+def test_body_lines_reject_a_line_over_the_record_cap(monkeypatch):
+    monkeypatch.setattr(server, "PRODUCT_IMPORT_MAX_RECORD_CHARS", 10)
+
+    class Body:
+        async def stream(self):
+            yield b"title\n"
+            for _ in range(5):
+                yield b"x" * 4
+
+    async def collect():
+        return [line async for line in server.iter_body_lines(Body())]
+
+    with pytest.raises(server.HTTPException) as caught:
+        asyncio.run(collect())
+    assert caught.value.status_code == 400
@@ -0,0 +1,84 @@
+"""Every filtered route query must be answered by an index, never a COLLSCAN."""
+from datetime import datetime
+
+import pytest
+from pymongo import ASCENDING, DESCENDING
+
+import server
+
+# (collection, filter, sort) for each lookup the API routes issue.
+QUERY_SHAPES = [
+    ("users", {"id": "u1"}, None),  # get_current_user, cart writes
+    ("users", {"email": "a@example.com"}, None),  # signup
+    ("users", {"mobile_number": "9000000000"}, None),  # signup
+    ("users", {"$or": [{"email": "a@example.com"}, {"mobile_number": "a@example.com"}]}, None),  # login
+    ("products", {"id": "p1"}, None),  # get_product, cart, checkout
+    # get_products listing, one shape per sort with and without filters
+    ("products", {}, [("_id", ASCENDING)]),
+    ("products", {"category": "Book"}, [("_id", ASCENDING)]),
+    ("products", {"effective_price": {"$gte": 50, "$lte": 150}}, [("effective_price", ASCENDING), ("_id", ASCENDING)]),
+    (
+        "products",
+        {"category": "Book", "effective_price": {"$gte": 50}},
+        [("effective_price", DESCENDING), ("_id", DESCENDING)],
+    ),
+    ("products", {"category": "Book"}, [("title", ASCENDING), ("_id", ASCENDING)]),
+    ("products", {"reservations.reserved_at": {"$lt": datetime(2025, 1, 3)}}, None),  # release_abandoned_reservations
+    ("orders", {"id": "o1"}, None),  # update_order_status
+    # get_user_orders / get_all_orders pages, first and later
+    ("orders", {"user_id": "u1"}, [("order_date", DESCENDING), ("id", DESCENDING)]),
+    (
+        "orders",
+        {"user_id": "u1", "$or": [{"order_date": {"$lt": "2025-01-03"}}, {"order_date": "2025-01-03", "id": {"$lt": "o2"}}]},
+        [("order_date", DESCENDING), ("id", DESCENDING)],
+    ),
+    ("orders", {}, [("order_date", DESCENDING), ("id", DESCENDING)]),
+    # bulk_update_order_status by filter
+    ("orders", {"status": "Pending", "order_date": {"$lt": "2025-01-03"}}, [("order_date", ASCENDING)]),
+    ("orders", {"order_date": {"$lt": "2025-01-03"}}, [("order_date", ASCENDING)]),
+    # archive_order_batch, and history pages that reach the archive
+    ("orders", {"status": {"$in": ["Delivered", "Cancelled"]}, "order_date": {"$lt": "2025-01-03"}}, [("order_date", ASCENDING)]),
+    ("orders_archive", {"user_id": "u1"}, [("order_date", DESCENDING), ("id", DESCENDING)]),
+    ("orders_archive", {}, [("order_date", DESCENDING), ("id", DESCENDING)]),
+    # admin analytics
+    ("sales_rollups", {"kind": "day", "date": {"$gte": "2025-01-01"}}, [("date", ASCENDING)]),
+    ("sales_rollups", {"kind": "product"}, [("units", DESCENDING)]),
+]
+
+
+def _stages(plan):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+@pytest.fixture
+def indexed_db(mongo_db):
+    for collection, indexes in server.INDEXES.items():
+        mongo_db[collection].create_indexes(indexes)
+    mongo_db.users.insert_many([
+        {"id": "u1", "email": "a@example.com", "mobile_number": None, "role": "user"},
+        {"id": "u2", "email": None, "mobile_number": "9000000000", "role": "user"},
+        {"id": "u3", "email": None, "mobile_number": None, "role": "user"},
+    ])
+    mongo_db.products.insert_many([
+        {"id": f"p{i}", "title": f"t{i}", "category": "Book", "effective_price": 50.0 * i} for i in range(3)
+    ])
+    mongo_db.orders.insert_many([
+        {"id": f"o{i}", "user_id": "u1", "order_date": f"2025-01-0{i + 1}"} for i in range(3)
+    ])
+    return mongo_db
+
+
+@pytest.mark.parametrize("collection,query,sort", QUERY_SHAPES)
+def test_route_query_uses_index(indexed_db, collection, query, sort):
+    cursor = indexed_db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    stages = set(_stages(plan))
+    assert "COLLSCAN" not in stages, plan
+    assert "SORT" not in stages, plan
@@ -0,0 +1,71 @@
+"""Token-bucket rate limits and adaptive load shedding."""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import server
+
+
+def test_token_bucket_allows_burst_then_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+    limiter = server.TokenBucketLimiter.from_spec("60/3", max_keys=10)
+
+    assert [limiter.hit("ip:a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.hit("ip:a") == 1.0
+    assert limiter.hit("ip:b") == 0
+
+    now[0] += 1
+    assert limiter.hit("ip:a") == 0
+
+
+def test_token_bucket_forgets_least_recent_keys():
+    limiter = server.TokenBucketLimiter(per_minute=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.hit(key)
+    assert list(limiter._buckets) == ["b", "c"]
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(server.LoadSheddingMiddleware)
+
+    @app.get("/api/products")
+    def products():
+        return []
+
+    @app.post("/api/auth/login")
+    def login():
+        return {}
+
+    return TestClient(app)
+
+
+def test_soft_lag_sheds_only_expensive_routes(monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(server, "event_loop_lag", server.SHED_SOFT_LAG_SECONDS * 2)
+
+    response = client.post("/api/auth/login")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/api/products").status_code == 200
+
+
+def test_hard_lag_sheds_everything(monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(server, "event_loop_lag", server.SHED_HARD_LAG_SECONDS * 2)
+    assert client.get("/api/products").status_code == 503
+
+
+def make_request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return server.Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_client_ip_is_the_address_our_proxy_saw(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    # The client's own X-Forwarded-For entry is spoofable; the proxy's appended one isn't
+    assert server.client_ip(make_request("10.0.0.1", "6.6.6.6, 203.0.113.7")) == "203.0.113.7"
+    assert server.client_ip(make_request("127.0.0.1")) == "127.0.0.1"
+
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 0)
+    assert server.client_ip(make_request("10.0.0.1", "203.0.113.7")) == "10.0.0.1"
@@ -0,0 +1,95 @@
+"""Hindi-aware tokenizing and ranking of the in-memory product search index."""
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+def test_nukta_forms_fold_to_the_base_letter():
+    # U+0958 is the precomposed क़; NFD splits off the nukta, which is dropped
+    assert server.search_tokens("क़लम") == server.search_tokens("कलम")
+
+
+def test_chandrabindu_and_anusvara_match():
+    assert server.search_tokens("चाँद") == server.search_tokens("चांद")
+
+
+def test_long_and_short_matras_match():
+    assert server.search_tokens("दीवार") == server.search_tokens("दिवार")
+    assert server.search_tokens("पूजा") == server.search_tokens("पुजा")
+
+
+def test_matras_stay_inside_one_token():
+    assert server.search_tokens("किताबें, कविता-संग्रह!") == ["किताबें", "कविता", "संग्रह"]
+
+
+def make_index():
+    index = server.ProductSearchIndex()
+    index.add("p1", "कविता संग्रह", "प्रकृति के रंग")
+    index.add("p2", "यात्रा वृत्तांत", "भारत की कविता और यात्रा")
+    index.add("p3", "चाँद की रात", "एक उपन्यास")
+    return index
+
+
+def test_last_word_matches_as_prefix_from_three_code_points():
+    index = make_index()
+    assert set(index.search("कवि", 10)) == {"p1", "p2"}  # क व ि
+    assert index.search("कव", 10) == []  # too short for a prefix
+    assert index.search("कवि ", 10) == []  # a trailing space means a whole word
+
+
+def test_every_query_term_is_required():
+    index = make_index()
+    assert index.search("कविता भारत ", 10) == ["p2"]
+    assert index.search("कविता उपन्यास ", 10) == []
+
+
+def test_title_matches_rank_above_description_matches():
+    assert make_index().search("कविता", 10) == ["p1", "p2"]
+
+
+def test_folded_query_finds_unfolded_title():
+    assert make_index().search("चांद", 10) == ["p3"]
+
+
+def test_remove_and_re_add_keep_vocabulary_consistent():
+    index = make_index()
+    index.remove("p3")
+    assert "उपन्यास" not in index.vocabulary
+    assert index.search("उपन्यास", 10) == []
+    index.add("p1", "नया शीर्षक", "उपन्यास")
+    index.add("p1", "नया शीर्षक", "उपन्यास")
+    assert index.vocabulary == sorted(index.postings)
+    assert "संग्रह" not in index.postings
+    assert index.search("उपन्यास", 10) == ["p1"]
+
+
+def test_only_other_workers_changes_trigger_a_rebuild(monkeypatch):
+    database = AsyncMongoMockClient()["anukriti_test"]
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "search_index_marker", None)
+    monkeypatch.setattr(server, "SEARCH_INDEX_REFRESH_SECONDS", 0.01)
+    rebuilds = []
+
+    async def rebuild():
+        rebuilds.append(await server.catalog_marker())
+
+    monkeypatch.setattr(server, "rebuild_search_index", rebuild)
+
+    async def scenario():
+        refresh = asyncio.create_task(server.refresh_search_index())
+        await asyncio.sleep(0.05)
+        # This worker's own admin writes are already in its index
+        await server.mark_catalog_changed()
+        await server.mark_catalog_changed()
+        await asyncio.sleep(0.05)
+        # Another worker's write is not
+        await database.catalog_state.update_one({"_id": "products"}, {"$inc": {"version": 1}})
+        await server.mark_catalog_changed()
+        await asyncio.sleep(0.05)
+        refresh.cancel()
+
+    asyncio.run(scenario())
+    assert rebuilds == [0, 4]
+    assert server.search_index_marker == 4
@@ -0,0 +1,34 @@
+"""?fields= and ?view= selection for list routes."""
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_requested_fields_keep_response_order_and_required_fields():
+    selected = server.requested_fields("stock, title,", None, server.PRODUCT_FIELDS, ("id",))
+    assert selected == ("id", "title", "stock")
+    assert server.requested_fields(None, "card", server.PRODUCT_FIELDS, ("id",)) is None
+
+
+@pytest.mark.parametrize("fields, view", [("title,password", None), ("title", "card")])
+def test_requested_fields_rejects_unknown_fields_and_mixed_selection(fields, view):
+    with pytest.raises(HTTPException) as error:
+        server.requested_fields(fields, view, server.PRODUCT_FIELDS, ("id",))
+    assert error.value.status_code == 400
+
+
+def test_order_summary_view_leaves_out_shipping_address():
+    projection = server.order_list_projection(None, "summary")
+    assert "shipping_address" not in projection and "user_id" not in projection
+    assert projection["products.title"] == 1
+    assert server.order_list_projection("status", None) == {"_id": 0, "id": 1, "status": 1, "order_date": 1}
+
+
+def test_page_models_describe_sparse_items():
+    assert tuple(server.ProductFields.model_fields) == server.PRODUCT_FIELDS
+    assert tuple(server.OrderFields.model_fields) == server.ORDER_FIELDS
+    page = server.OrderPage.model_validate({"orders": [{"id": "o1", "order_date": "2025-01-02", "status": "Pending"}]})
+    assert page.orders[0].user_id is None
+    page = server.ProductPage.model_validate({"products": [{"id": "p1", "title": "t"}]})
+    assert page.products[0].stock is None